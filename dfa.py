@@ -0,0 +1,388 @@
+# *** DFA ***
+
+
+
+import sys
+import sre_parse
+import sre_constants as sre
+from array import array
+from bisect import bisect_right
+
+
+
+
+MAX_CHAR = sys.maxunicode
+MAX_DFA_STATES = 4096     # subset construction gives up beyond this
+MAX_NFA_STATES = 20000    # counted repeats are expanded into copies
+
+
+ASCII_CATEGORIES = {
+    sre.CATEGORY_DIGIT: [(48, 57)],
+    sre.CATEGORY_SPACE: [(9, 13), (32, 32)],
+    sre.CATEGORY_WORD: [(48, 57), (65, 90), (95, 95), (97, 122)],
+}
+ASCII_CATEGORIES.update({
+    sre.CATEGORY_NOT_DIGIT: None,  # complements are computed below
+    sre.CATEGORY_NOT_SPACE: None,
+    sre.CATEGORY_NOT_WORD: None,
+})
+
+# flags that don't change the language a pattern matches (anchors are unsupported anyway)
+SUPPORTED_FLAGS = sre.SRE_FLAG_DOTALL | sre.SRE_FLAG_MULTILINE | sre.SRE_FLAG_VERBOSE
+
+
+
+
+class NonRegularPattern(ValueError):
+    '''Raised if a regexp can't be compiled into a DFA.'''
+    pass
+
+
+
+
+def normalize(intervals):
+    '''Sort and merge a list of (lo, hi) character code intervals.'''
+    res = []
+    for lo, hi in sorted(intervals):
+        if res and lo <= res[-1][1] + 1:
+            res[-1] = (res[-1][0], max(hi, res[-1][1]))
+        else:
+            res.append((lo, hi))
+    return res
+
+
+def complement(intervals):
+    res, lo = [], 0
+    for a, b in normalize(intervals):
+        if a > lo:
+            res.append((lo, a - 1))
+        lo = b + 1
+    if lo <= MAX_CHAR:
+        res.append((lo, MAX_CHAR))
+    return res
+
+
+ASCII_CATEGORIES[sre.CATEGORY_NOT_DIGIT] = complement(ASCII_CATEGORIES[sre.CATEGORY_DIGIT])
+ASCII_CATEGORIES[sre.CATEGORY_NOT_SPACE] = complement(ASCII_CATEGORIES[sre.CATEGORY_SPACE])
+ASCII_CATEGORIES[sre.CATEGORY_NOT_WORD] = complement(ASCII_CATEGORIES[sre.CATEGORY_WORD])
+
+
+
+
+class NFA(object):
+    '''Thompson NFA: epsilon edges and edges labelled with character sets
+       (lists of code intervals). A fragment is a pair (start, end).'''
+
+    def __init__(self):
+        self.eps = []
+        self.edges = []
+        self.accept = {}  # final state => rule index
+
+
+    def new_state(self):
+        if len(self.eps) >= MAX_NFA_STATES:
+            raise NonRegularPattern("too many NFA states")
+        self.eps.append([])
+        self.edges.append([])
+        return len(self.eps) - 1
+
+
+    def add_rule(self, regexp, rule_index):
+        '''Add a compiled regexp as an alternative; return its fragment.'''
+        if regexp.flags & ~SUPPORTED_FLAGS:
+            raise NonRegularPattern("unsupported flags in %r" % regexp.pattern)
+        dotall = bool(regexp.flags & sre.SRE_FLAG_DOTALL)
+        start, end = self._sequence(sre_parse.parse(regexp.pattern, regexp.flags), dotall)
+        self.accept[end] = rule_index
+        return start, end
+
+
+    def _sequence(self, subpattern, dotall):
+        start = end = self.new_state()
+        for op, av in subpattern:
+            s, e = self._item(op, av, dotall)
+            self.eps[end].append(s)
+            end = e
+        return start, end
+
+
+    def _item(self, op, av, dotall):
+        if op == sre.LITERAL:
+            return self._charset([(av, av)])
+        elif op == sre.NOT_LITERAL:
+            return self._charset(complement([(av, av)]))
+        elif op == sre.ANY:
+            return self._charset([(0, MAX_CHAR)] if dotall else complement([(10, 10)]))
+        elif op == sre.IN:
+            return self._charset(self._in_intervals(av))
+        elif op == sre.SUBPATTERN:
+            group, subpattern = av[0], av[-1]
+            return self._sequence(subpattern, dotall)
+        elif op == sre.BRANCH:
+            start, end = self.new_state(), self.new_state()
+            for subpattern in av[1]:
+                s, e = self._sequence(subpattern, dotall)
+                self.eps[start].append(s)
+                self.eps[e].append(end)
+            return start, end
+        elif op == sre.MAX_REPEAT:
+            return self._repeat(av, dotall)
+        raise NonRegularPattern("unsupported regexp construct: %s" % op)
+
+
+    def _repeat(self, (lo, hi, subpattern), dotall):
+        start = end = self.new_state()
+        for _ in xrange(lo):
+            s, e = self._sequence(subpattern, dotall)
+            self.eps[end].append(s)
+            end = e
+        if hi == sre.MAXREPEAT:
+            s, e = self._sequence(subpattern, dotall)
+            self.eps[end].append(s)
+            self.eps[e].append(end)
+            return start, end
+        final = self.new_state()
+        for _ in xrange(hi - lo):
+            s, e = self._sequence(subpattern, dotall)
+            self.eps[end].append(s)
+            self.eps[end].append(final)
+            end = e
+        self.eps[end].append(final)
+        return start, final
+
+
+    def _charset(self, intervals):
+        start, end = self.new_state(), self.new_state()
+        self.edges[start].append((normalize(intervals), end))
+        return start, end
+
+
+    def _in_intervals(self, items):
+        intervals, negate = [], False
+        for op, av in items:
+            if op == sre.NEGATE:
+                negate = True
+            elif op == sre.LITERAL:
+                intervals.append((av, av))
+            elif op == sre.RANGE:
+                intervals.append(av)
+            elif op == sre.CATEGORY and av in ASCII_CATEGORIES:
+                intervals.extend(ASCII_CATEGORIES[av])
+            else:
+                raise NonRegularPattern("unsupported character set item: %s" % op)
+        return complement(intervals) if negate else normalize(intervals)
+
+
+
+def is_regular(regexp):
+    '''Return True if a compiled regexp can be compiled into a DFA.'''
+    try:
+        NFA().add_rule(regexp, 0)
+        return True
+    except (NonRegularPattern, RuntimeError):  # RuntimeError: deep recursion
+        return False
+
+
+def first_chars(regexp):
+    '''Return the characters (normalized code intervals) a match of a
+    compiled regexp can start with; None if they are unknown (the regexp is
+    not regular or it matches the empty string).'''
+    nfa = NFA()
+    try:
+        start, end = nfa.add_rule(regexp, 0)
+    except (NonRegularPattern, RuntimeError):
+        return None
+    states = epsilon_closure(nfa, [start])
+    if end in states:
+        return None
+    return normalize([interval for s in states
+                      for intervals, _ in nfa.edges[s]
+                      for interval in intervals])
+
+
+def contains(intervals, char):
+    '''Return True if the char belongs to normalized code intervals.'''
+    code = ord(char)
+    i = bisect_right(intervals, (code, MAX_CHAR + 1)) - 1
+    return i >= 0 and intervals[i][0] <= code <= intervals[i][1]
+
+
+def epsilon_closure(nfa, states):
+    res, stack = set(states), list(states)
+    while stack:
+        for t in nfa.eps[stack.pop()]:
+            if t not in res:
+                res.add(t)
+                stack.append(t)
+    return frozenset(res)
+
+
+
+
+class DFA(object):
+    '''Minimized DFA recognizing the union of regexps (rules). Scans with
+       longest-match semantics; if several rules match the longest
+       lexeme, the first one wins.
+
+       The transition table is flat: table[state * num_classes + cls] is
+       the next state (-1 if none), where cls is the class of the input
+       character (characters no regexp tells apart share a class).
+       accept[state] is the index of the rule accepted in the state or -1.'''
+
+    def __init__(self, regexps, max_states=MAX_DFA_STATES):
+        nfa = NFA()
+        starts = [nfa.add_rule(regexp, i)[0] for i, regexp in enumerate(regexps)]
+        nfa_start = nfa.new_state()
+        nfa.eps[nfa_start].extend(starts)
+
+        self.bounds = self._make_classes(nfa)
+        self.num_classes = len(self.bounds)
+        table, accept = self._subset_construction(nfa, nfa_start, max_states)
+        self.table, self.accept = self._minimize(table, accept)
+        self.num_states = len(self.accept)
+        self.num_rules = len(regexps)
+        self._class_cache = {}
+
+
+    @property
+    def table_size(self):
+        return len(self.table)
+
+
+    def char_class(self, char):
+        cls = self._class_cache.get(char)
+        if cls is None:
+            cls = self._class_cache[char] = bisect_right(self.bounds, ord(char)) - 1
+        return cls
+
+
+    def match(self, text, pos, endpos=None):
+        '''Return (rule index, end) of the longest match of text at pos,
+        (-1, pos) if nothing matches.'''
+        table, accept, num_classes = self.table, self.accept, self.num_classes
+        classes, char_class = self._class_cache, self.char_class
+        endpos = len(text) if endpos is None else endpos
+        state, rule, end = 0, self.accept[0], pos
+        i = pos
+        while i < endpos:
+            ch = text[i]
+            cls = classes.get(ch)
+            if cls is None:
+                cls = char_class(ch)
+            state = table[state * num_classes + cls]
+            if state < 0:
+                break
+            i += 1
+            if accept[state] >= 0:
+                rule, end = accept[state], i
+        return rule, end
+
+
+    def scans_to_end(self, text, pos):
+        '''Return True if a scan of text from pos reaches the end of text
+        in a live state: a longer text could have a longer match.'''
+        table, num_classes = self.table, self.num_classes
+        classes, char_class = self._class_cache, self.char_class
+        state = 0
+        for i in xrange(pos, len(text)):
+            ch = text[i]
+            cls = classes.get(ch)
+            if cls is None:
+                cls = char_class(ch)
+            state = table[state * num_classes + cls]
+            if state < 0:
+                return False
+        return True
+
+
+    def _make_classes(self, nfa):
+        '''Split the alphabet into classes of characters that no edge
+        distinguishes; label the edges with lists of classes.'''
+        points = set([0])
+        for edges in nfa.edges:
+            for intervals, _ in edges:
+                for lo, hi in intervals:
+                    points.add(lo)
+                    if hi < MAX_CHAR:
+                        points.add(hi + 1)
+        bounds = sorted(points)
+        self._class_edges = []
+        for edges in nfa.edges:
+            labelled = []
+            for intervals, target in edges:
+                classes = []
+                for lo, hi in intervals:
+                    first = bisect_right(bounds, lo) - 1
+                    last = bisect_right(bounds, hi) - 1
+                    classes.extend(xrange(first, last + 1))
+                labelled.append((classes, target))
+            self._class_edges.append(labelled)
+        return bounds
+
+
+    def _subset_construction(self, nfa, nfa_start, max_states):
+        start = epsilon_closure(nfa, [nfa_start])
+        index, dstates = {start: 0}, [start]
+        table, accept = [], []
+        for dstate in dstates:  # dstates grows while iterating
+            moves = {}
+            for s in dstate:
+                for classes, target in self._class_edges[s]:
+                    for cls in classes:
+                        moves.setdefault(cls, set()).add(target)
+            row = [-1] * self.num_classes
+            for cls, targets in moves.items():
+                target = epsilon_closure(nfa, targets)
+                if target not in index:
+                    if len(dstates) >= max_states:
+                        raise NonRegularPattern("DFA has more than %d states" % max_states)
+                    index[target] = len(dstates)
+                    dstates.append(target)
+                row[cls] = index[target]
+            table.append(row)
+            rules = [nfa.accept[s] for s in dstate if s in nfa.accept]
+            accept.append(min(rules) if rules else -1)
+        del self._class_edges
+        return table, accept
+
+
+    def _minimize(self, table, accept):
+        '''Drop the states that can't reach an accepting state and merge
+        equivalent states (Moore's partition refinement).'''
+        live = set(s for s, rule in enumerate(accept) if rule >= 0)
+        changed = True
+        while changed:
+            changed = False
+            for s, row in enumerate(table):
+                if s not in live and any(t in live for t in row):
+                    live.add(s)
+                    changed = True
+        live.add(0)  # the start state is kept even if nothing matches
+
+        part = {s: accept[s] for s in live}
+        num_parts = len(set(part.values()))
+        while True:
+            signatures = {}
+            new_part = {}
+            for s in sorted(live):
+                signature = (part[s],) + tuple(part[t] if t in live else None
+                                               for t in table[s])
+                new_part[s] = signatures.setdefault(signature, len(signatures))
+            part = new_part
+            if len(signatures) == num_parts:
+                break
+            num_parts = len(signatures)
+
+        # renumber so that the start state is 0
+        order = {}
+        for s in sorted(live):
+            order.setdefault(part[s], len(order))
+        new_table = array('i', [-1] * (len(order) * self.num_classes))
+        new_accept = array('i', [-1] * len(order))
+        for s in live:
+            state = order[part[s]]
+            new_accept[state] = accept[s]
+            for cls, t in enumerate(table[s]):
+                if t in live:
+                    new_table[state * self.num_classes + cls] = order[part[t]]
+        return new_table, new_accept
@@ -0,0 +1,34 @@
+import sys
+import time
+import yacc
+import json_yacc
+from json_lex import lexer
+
+
+
+# Parses JSON arrays of growing length with the Earley parser, with and
+# without Leo's items. The lists of json_yacc.py are right-recursive
+# (ELEMENTS : VALUE comma ELEMENTS), so without them the time is quadratic.
+
+def json_array(n):
+    return "[%s]" % ", ".join("%d" % i for i in xrange(n))
+
+
+def timed_parse(parser, text):
+    t = time.time()
+    parser.parse(text, lexer)
+    return time.time() - t
+
+
+
+
+if __name__ == "__main__":
+    sizes = map(int, sys.argv[1:]) or [250, 500, 1000, 2000]
+    with_leo = yacc.yacc(parser="EARLEY", module=json_yacc)
+    without_leo = yacc.yacc(parser="EARLEY", module=json_yacc, leo=False)
+    print "%8s %12s %12s" % ("elements", "leo", "no leo")
+    for n in sizes:
+        text = json_array(n)
+        t_leo = timed_parse(with_leo, text)
+        t_no_leo = timed_parse(without_leo, text)
+        print "%8d %11.3fs %11.3fs" % (n, t_leo, t_no_leo)
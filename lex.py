@@ -4,10 +4,18 @@
 
 import inspect
 import sys
+import mmap
+import multiprocessing
 from functools import partial
 from collections import namedtuple
 import re
-from utils import get_global_vars, filter_variables, by_appearance, categorize, for_all, for_any
+from array import array
+from bisect import bisect_left, bisect_right
+import sre_parse
+import sre_constants
+import dfa
+from utils import (get_global_vars, filter_variables, by_appearance, categorize, for_all, for_any,
+                   map_batch, signature, load_cache, save_cache)
 
 
 
@@ -16,10 +24,96 @@ from utils import get_global_vars, filter_variables, by_appearance, categorize,
 
 
 
-class LexToken(object):
+TAB_SIZE = 8
+
+
+def advance_position(lineno, col, text):
+    '''Return (lineno, col) reached after consuming text from (lineno, col).
+    Newlines are counted in bulk, tabs are expanded only when present.'''
+    newlines = text.count('\n')
+    if newlines:
+        lineno, col = lineno + newlines, 1
+        text = text[text.rfind('\n') + 1:]
+    if '\t' not in text:
+        return lineno, col + len(text)
+    pad = (col - 1) % TAB_SIZE  # column relative to the previous tab stop
+    return lineno, col - pad + len((' ' * pad + text).expandtabs(TAB_SIZE))
+
+
+
+class LineIndex(object):
+    '''Start offsets of all lines of a text (found on first use). Maps
+       an offset to (lineno, col) with a binary search.'''
+
+    def __init__(self, text):
+        self.text = text
+        self._starts = None
+
+    @property
+    def starts(self):
+        if self._starts is None:
+            text, starts = self.text, array('l', [0])
+            i = text.find('\n')
+            while i != -1:
+                starts.append(i + 1)
+                i = text.find('\n', i + 1)
+            self._starts = starts
+        return self._starts
+
+    def position(self, offset):
+        lineno = bisect_right(self.starts, offset)
+        line_start = self.starts[lineno - 1]
+        return advance_position(lineno, 1, self.text[line_start:offset])
+
+
+
+class BaseToken(object):
+    '''Position of a token in the input. If lineno and pos are None,
+       they are computed from lexpos when first read, with 'lines' (the
+       LineIndex of the input the token comes from).'''
+
+    __slots__ = ("_lineno", "_pos", "lexpos", "lexer", "value", "lines")
+
     def __init__(self):
         self.lineno = self.pos = 0
-        self.is_error = False
+        self.lexpos = 0
+
+    @property
+    def lineno(self):
+        if self._lineno is None:
+            self._compute_position()
+        return self._lineno
+
+    @lineno.setter
+    def lineno(self, value):
+        self._lineno = value
+
+    @property
+    def pos(self):
+        if self._pos is None:
+            self._compute_position()
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        self._pos = value
+
+    def _compute_position(self):
+        self._lineno, self._pos = self.lines.position(self.lexpos)
+
+    @property
+    def text(self):
+        '''The value decoded with the lexer's encoding (bytes mode).'''
+        if isinstance(self.value, str) and self.lexer.bytes_mode:
+            return self.value.decode(self.lexer.encoding)
+        return self.value
+
+
+
+class LexToken(BaseToken):
+    __slots__ = ("type", "type_id")
+
+    is_error = False
 
     def __str__(self):
         return "LexToken(%s, %r, %d, %d)" % (self.type,
@@ -28,10 +122,10 @@ class LexToken(object):
                                              self.pos)
 
 
-class LexError(object):
-    def __init__(self):
-        self.lineno = self.pos = 0
-        self.is_error = True
+class LexError(BaseToken):
+    __slots__ = ("error_msg",)
+
+    is_error = True
 
     def __str__(self):
         return "LexError(%r, %r, %d, %d)" % (self.error_msg,
@@ -41,6 +135,265 @@ class LexError(object):
 
 
 
+class TokenBuffer(object):
+    '''Compact storage of the tokens of an input (struct of arrays).
+       Token i is described by its type id, start/end offsets, line
+       number and column. Its value is a slice of the input unless a rule
+       has changed it (only such values are stored). LexToken objects are
+       materialised on demand: buffer[i]. Lex errors are kept as LexError
+       objects in 'errors'.'''
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+        # a streaming input is not kept, so all values have to be stored
+        self.data = lexer.lexdata if lexer._chunks is None else None
+        self.lines = lexer.line_index()  # LineIndex of data (lazy positions)
+        self.type_names = tuple(lexer.token_names)  # type id => token name
+        self.types = array('i')
+        self.starts, self.ends = array('l'), array('l')
+        self.linenos, self.cols = array('i'), array('i')
+        self.values = {}  # token index => value set by a rule
+        self.errors = []
+
+
+    def __len__(self):
+        return len(self.types)
+
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.types):
+            raise IndexError("token index out of range")
+        token = LexToken()
+        token.lexer, token.type = self.lexer, self.type(i)
+        token.type_id = self.types[i]
+        token.value = self.value(i)
+        token.lexpos = self.starts[i]
+        if self.linenos:
+            token.lineno, token.pos = self.linenos[i], self.cols[i]
+        else:  # lazy positions
+            token.lineno = token.pos = None
+            token.lines = self.lines
+        return token
+
+
+    def __iter__(self):
+        for i in xrange(len(self.types)):
+            yield self[i]
+
+
+    def find(self, start):
+        '''Return the index of the token starting at offset start or None.'''
+        i = bisect_right(self.starts, start) - 1
+        return i if i >= 0 and self.starts[i] == start else None
+
+
+    def has_item_at(self, start):
+        '''Return True if a token or an error starts at offset start.'''
+        if self.find(start) is not None:
+            return True
+        e = self.first_error(start)
+        return e < len(self.errors) and self.errors[e].lexpos == start
+
+
+    def extend(self, other, n):
+        '''Append the first n tokens of another buffer of the same input
+        and all of its errors.'''
+        offset = len(self.types)
+        for i, value in other.values.items():
+            if i < n:
+                self.values[offset + i] = value
+        self.types.extend(other.types[:n])
+        self.starts.extend(other.starts[:n])
+        self.ends.extend(other.ends[:n])
+        self.linenos.extend(other.linenos[:n])
+        self.cols.extend(other.cols[:n])
+        self.errors.extend(other.errors)
+
+
+    def truncate(self, offset, keep="before"):
+        '''Drop the tokens and errors starting at offset or later (or, if
+        keep is "after", the ones starting before offset).'''
+        n, e = bisect_right(self.starts, offset - 1), self.first_error(offset)
+        if keep == "before":
+            for i in xrange(n, len(self.types)):
+                self.values.pop(i, None)
+            sl, self.errors = slice(n, None), self.errors[:e]
+        else:
+            sl, self.errors = slice(None, n), self.errors[e:]
+            self.values = {i - n: v for i, v in self.values.items() if i >= n}
+        for arr in (self.types, self.starts, self.ends, self.linenos, self.cols):
+            del arr[sl]
+
+
+    def first_error(self, offset):
+        '''Return the index of the first error at offset or later.'''
+        errors, lo, hi = self.errors, 0, len(self.errors)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if errors[mid].lexpos < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def replace(self, first, end, other, (lexpos, old_lexpos, delta), (lines, line, columns)):
+        '''Replace the tokens first..end-1 and the errors starting between
+        the offsets lexpos and old_lexpos with the ones of other, a buffer
+        of the edited input (in place). The tokens and errors after them
+        are shifted by delta offsets and 'lines' lines; the columns of those
+        on the (old) line 'line' are moved by columns (a ColumnShift).'''
+        n = len(other)
+        moved = first + n - end
+        if moved:
+            self.values = dict([(i, v) for i, v in self.values.items() if i < first] +
+                               [(first + i, v) for i, v in other.values.items()] +
+                               [(i + moved, v) for i, v in self.values.items() if i >= end])
+        else:
+            for i in xrange(first, end):
+                self.values.pop(i, None)
+            for i, v in other.values.items():
+                self.values[first + i] = v
+        after = slice(first + n, None)
+        self.types[first:end] = other.types
+        self.starts[first:end], self.ends[first:end] = other.starts, other.ends
+        if delta:
+            self.starts[after] = array('l', [s + delta for s in self.starts[after]])
+            self.ends[after] = array('l', [e + delta for e in self.ends[after]])
+        lazy = self.lexer.lazy_positions
+        if not lazy:
+            self.linenos[first:end], self.cols[first:end] = other.linenos, other.cols
+            on_line = bisect_right(self.linenos, line, first + n)  # the tail on the line 'line'
+            if on_line > first + n:
+                columns.shift(self.cols, self.starts, first + n, on_line)
+            if lines:
+                self.linenos[after] = array('i', [l + lines for l in self.linenos[after]])
+        head = self.errors[:self.first_error(lexpos)]
+        tail = self.errors[self.first_error(old_lexpos):]
+        if lazy:
+            for e in head:
+                e.lines = other.lines  # the positions before the edit are the same
+        for e in tail:
+            if lazy:
+                e.lineno = e.pos = None  # computed from the new input
+                e.lines = other.lines
+            else:
+                if e.lineno == line:
+                    e.pos = columns.column(e.lexpos + delta, e.pos)
+                e.lineno += lines
+            e.lexpos += delta
+        self.errors = head + other.errors + tail
+        self.data, self.lines = other.data, other.lines
+
+
+    def type(self, i):
+        return self.type_names[self.types[i]]
+
+
+    def value(self, i):
+        try:
+            return self.values[i]
+        except KeyError:
+            return self.data[self.starts[i]: self.ends[i]]
+
+
+    def append(self, type_id, start, end, lineno, col, lexeme=None):
+        '''Append a token whose value is the lexeme data[start:end].'''
+        if self.data is None:
+            self.values[len(self.types)] = lexeme
+        self.types.append(type_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        if lineno is not None:
+            self.linenos.append(lineno)
+            self.cols.append(col)
+
+
+    def append_token(self, token, end, lexeme=None):
+        '''Append a LexToken produced by a rule (lexeme is the text matched).'''
+        if token.value is not lexeme:
+            self.values[len(self.types)] = token.value
+        if self.lexer.lazy_positions:
+            self.append(token.type_id, token.lexpos, end, None, None, token.value)
+        else:
+            self.append(token.type_id, token.lexpos, end, token.lineno, token.pos, token.value)
+
+
+
+class LexDataView(object):
+    '''Read-only view of the input text starting at index 'start'.
+       Nothing is copied until the text is actually read; the methods of
+       strings (find, split...) are those of the rest of the input.'''
+
+    def __init__(self, data, start):
+        self.data = data
+        self.start = start
+
+    def rest(self):
+        '''Return the rest of the input (a copy, of the type of the input).'''
+        return self.data[self.start:]
+
+    def __len__(self):
+        return max(len(self.data) - self.start, 0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.rest()[index]
+            return self.data[self.start + start: self.start + max(start, stop)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("view index out of range")
+        return self.data[self.start + index]
+
+    def __iter__(self):
+        for i in xrange(self.start, len(self.data)):
+            yield self.data[i]
+
+    def __getattr__(self, name):
+        return getattr(self.rest(), name)
+
+    def startswith(self, prefix, *args):
+        if args:
+            return self.rest().startswith(prefix, *args)
+        if isinstance(prefix, tuple):
+            return any(self.startswith(p) for p in prefix)
+        return self[:len(prefix)] == prefix
+
+    def __eq__(self, other):
+        if isinstance(other, LexDataView):
+            other = other.rest()
+        return self.rest() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.rest())
+
+    def __str__(self):
+        rest = self.rest()
+        return rest if isinstance(rest, str) else rest.encode("utf-8")
+
+    def __unicode__(self):
+        return unicode(self.rest())
+
+    def __repr__(self):
+        return repr(self.rest())
+
+
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+CHECKPOINT_INTERVAL = 64  # tokens between the checkpoints of a LexSession
+
+
+# state of a lexer before the token token_num (see Lexer.checkpoint)
+LexCheckpoint = namedtuple("LexCheckpoint", "token_num lexpos lineno col states exclusive")
+
+
+
 class LexState(object):
     def __init__(self,
                  ignore=None,
@@ -48,12 +401,220 @@ class LexState(object):
                  error=None,
                  type=None):
         self.ignore = ignore
+        self.ignore_chars = ""
+        self.ignore_regexp = None  # matches a run of ignore_chars
         self.rules = [] if (rules is None) else rules
         self.error = error
         self.type = type
 
 
 
+class LexRuleSet(object):
+    '''Token rules of a combination of active states compiled into
+       master regexps. Each master regexp is an alternation of named
+       groups (one per rule) in the order of appearance, so the first
+       alternative that matches is the first rule that matches; the rule
+       is recovered from the name of the outermost group (lastgroup).
+
+       Only the rules that can start with the character at the current
+       position are tried: master regexps are compiled (lazily) for each
+       distinct list of candidate rules of a first character.'''
+
+    # python's re module can't compile more than 100 groups at once
+    MAX_GROUPS = 99
+
+    def __init__(self, rules, tables=None):
+        self.rules = rules
+        self.segments = self._make_segments(rules)
+        # first chars of each rule (None - any char)
+        self.first_chars = tables if tables is not None else [dfa.first_chars(rule.regexp)
+                                                              for rule in rules]
+        self._dispatch = {}      # char => segments
+        self._candidates = {}    # tuple of candidate rules => segments
+        self._end_dfa = None     # see reaches_end
+
+
+    def tables(self):
+        '''Return the data computed from the rules (picklable, see Lexer.cachefile).'''
+        return self.first_chars
+
+
+    def reaches_end(self, text, pos):
+        '''Return True if a match at pos may go on past the end of text
+        (a longer text could match differently), False if it can't, None if
+        it is unknown (a rule is not regular). A DFA of all the rules is
+        built on first use: a match can't extend past the point where the
+        DFA has no transition.'''
+        if self._end_dfa is None:
+            self._end_dfa = False
+            if all(dfa.is_regular(rule.regexp) for rule in self.rules):
+                try:
+                    self._end_dfa = dfa.DFA([rule.regexp for rule in self.rules])
+                except dfa.NonRegularPattern:
+                    pass
+        if self._end_dfa is False:
+            return None
+        return self._end_dfa.scans_to_end(text, pos)
+
+
+    def match(self, text, pos=0):
+        '''Return (rule, match_obj) for the first rule matching text at
+        index pos, (None, None) if none of the rules matches.'''
+        ch = text[pos]
+        segments = self._dispatch.get(ch)
+        if segments is None:
+            segments = self._dispatch[ch] = self._get_segments_for(ch)
+        for regexp, group_rules in segments:
+            m = regexp.match(text, pos)
+            if m is not None:
+                return group_rules[m.lastgroup], m
+        return None, None
+
+
+    def _get_segments_for(self, ch):
+        candidates = tuple(rule for rule, first in zip(self.rules, self.first_chars)
+                           if first is None or dfa.contains(first, ch))
+        segments = self._candidates.get(candidates)
+        if segments is None:
+            segments = self._candidates[candidates] = self._make_segments(candidates)
+        return segments
+
+
+    def _make_segments(self, rules):
+        segments, group, num_groups = [], [], 0
+        for rule in rules:
+            rule_groups = rule.regexp.groups + 1
+            if not self._mergeable(rule.regexp):
+                segments += self._compile_segment(group)
+                segments.append((rule.regexp, {None: rule}))
+                group, num_groups = [], 0
+                continue
+            if num_groups + rule_groups > self.MAX_GROUPS:
+                segments += self._compile_segment(group)
+                group, num_groups = [], 0
+            group.append(rule)
+            num_groups += rule_groups
+        return segments + self._compile_segment(group)
+
+
+    def _compile_segment(self, rules):
+        if not rules:
+            return []
+        group_rules = {"R%d" % i: rule for i, rule in enumerate(rules)}
+        regexp = "|".join("(?P<R%d>%s)" % (i, rule.regexp.pattern)
+                          for i, rule in enumerate(rules))
+        return [(re.compile(regexp), group_rules)]
+
+
+    def _mergeable(self, regexp):
+        '''A regexp can be a part of a master regexp unless it sets global
+        flags, has named groups or backreferences (group numbers shift).'''
+        if regexp.flags & ~re.UNICODE or regexp.groupindex:
+            return False
+        return not _has_backreferences(sre_parse.parse(regexp.pattern))
+
+
+
+class SpanMatch(object):
+    '''Minimal match object for a match found without re (text[start:end]).'''
+
+    def __init__(self, text, start, end):
+        self.string, self._start, self._end = text, start, end
+
+    def group(self, n=0):
+        if n != 0:
+            raise IndexError("no such group")
+        return self.string[self._start: self._end]
+
+    def start(self, n=0):
+        return self._start
+
+    def end(self, n=0):
+        return self._end
+
+
+
+class DFARuleSet(object):
+    '''Token rules of a combination of active states compiled into a
+       minimized DFA, scanned with longest-match semantics (if several
+       rules match the longest lexeme, the first one wins). Rules which are
+       not regular (anchors, lookaround, backreferences, non-greedy repeats,
+       flags) are matched with their own regexps and compete for the
+       longest match as well. If the DFA gets too big, all rules are
+       matched this way.'''
+
+    def __init__(self, rules, tables=None):
+        self.rules = rules
+        if tables is None:
+            regular = [i for i, rule in enumerate(rules) if dfa.is_regular(rule.regexp)]
+            try:
+                automaton = dfa.DFA([rules[i].regexp for i in regular]) if regular else None
+            except dfa.NonRegularPattern:
+                automaton, regular = None, []
+        else:
+            regular, automaton = tables
+        self.dfa, self._regular = automaton, regular
+        self.dfa_rules = [rules[i] for i in regular]
+        self.fallback_rules = [rule for rule in rules if rule not in self.dfa_rules]
+        self._order = {rule: i for i, rule in enumerate(rules)}
+
+
+    def tables(self):
+        '''Return the data computed from the rules (picklable, see Lexer.cachefile).'''
+        return self._regular, self.dfa
+
+
+    def match(self, text, pos=0):
+        '''Return (rule, match_obj) for the longest match of text at index
+        pos, (None, None) if none of the rules matches.'''
+        best, end = None, -1
+        if self.dfa is not None:
+            index, dfa_end = self.dfa.match(text, pos)
+            if index >= 0:
+                best, end = self.dfa_rules[index], dfa_end
+        for rule in self.fallback_rules:
+            m = rule.regexp.match(text, pos)
+            if m is not None and (m.end() > end or
+                                  m.end() == end and self._order[rule] < self._order[best]):
+                best, end = rule, m.end()
+        if best is None:
+            return None, None
+        return best, SpanMatch(text, pos, end)
+
+
+    def reaches_end(self, text, pos):
+        '''See LexRuleSet.reaches_end.'''
+        if self.fallback_rules:
+            return None
+        return self.dfa is not None and self.dfa.scans_to_end(text, pos)
+
+
+    def stats(self):
+        '''Size of the compiled DFA, to compare it against the re engine.'''
+        d = self.dfa
+        return {"dfa_rules": len(self.dfa_rules),
+                "fallback_rules": [rule.__name__ for rule in self.fallback_rules],
+                "states": d.num_states if d else 0,
+                "classes": d.num_classes if d else 0,
+                "table_size": d.table_size if d else 0}
+
+
+
+def _has_backreferences(subpattern):
+    backrefs = (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS)
+    for op, av in subpattern:
+        if op in backrefs:
+            return True
+        args = av if isinstance(av, (list, tuple)) else [av]
+        for arg in args:
+            children = arg if isinstance(arg, list) else [arg]
+            for child in children:
+                if isinstance(child, sre_parse.SubPattern) and _has_backreferences(child):
+                    return True
+    return False
+
+
+
 def get_state_name(state):
     name, _ = state
     return name
@@ -71,22 +632,67 @@ def make_state(name, mode):
 
 
 class Lexer(object):
-    def __init__(self, module=None):
-        info = LexerInfo(module)
+    '''If lazy_positions is True, the lexer keeps track of lexpos only;
+    lineno and pos of a token are computed from the line index of the
+    input when first read (lexer.lineno is not updated).
+
+    If bytes_mode is True, the rules are compiled as byte patterns (unicode
+    docstrings are encoded with 'encoding') and the input may be any buffer
+    of bytes (str, mmap, bytearray); token values are undecoded slices of
+    the input (token.text decodes them).
+
+    engine selects how the rules of the active states are matched: "re"
+    (first matching rule in the order of appearance, see LexRuleSet) or
+    "dfa" (longest match, see DFARuleSet).
+
+    If cachefile is given, the data compiled from the rules (the DFA, the
+    first chars of the rules) is saved to it and loaded from it by the
+    next lexer with the same rules (see signature()). The rules of each
+    exclusive state are compiled and saved when the lexer is built; the
+    combinations with inclusive states met while lexing are saved when
+    the end of the input is reached.'''
+
+    engines = {"re": LexRuleSet, "dfa": DFARuleSet}
+
+    def __init__(self, module=None, lazy_positions=False, bytes_mode=False, encoding="utf-8",
+                 engine="re", cachefile=None):
+        if engine not in self.engines:
+            raise ValueError("available engines: %s" % ", ".join(sorted(self.engines)))
+        self.rule_set_class = self.engines[engine]
+        info = LexerInfo(module, bytes_mode=bytes_mode, encoding=encoding)
+        self.lazy_positions = lazy_positions
+        self.bytes_mode = bytes_mode
+        self.encoding = encoding
 
         self.token_names = info.token_names
+        self.token_ids = info.token_ids
         self.states = info.states
         self.rules_index = info.rules_index
 
         self.current_exclusive = self._default_state_name()
         self.current_states_names = [self._default_state_name()]
 
-        self.current_token_rules = self._get_current_token_rules()
+        self._rule_sets = {}  # frozenset of active states => LexRuleSet
+        self.cachefile = cachefile
+        self._tables = {}     # frozenset of active states => LexRuleSet.tables()
+        self._unsaved_tables = False
+        if cachefile is not None:
+            self._tables = load_cache(cachefile, self.signature()) or {}
+            for state_name, lexstate in self.states.items():
+                if self._exclusive_state(lexstate):
+                    self._get_rule_set([state_name])
+            self._save_tables()
+        self.current_rule_set = self._get_current_rule_set()
 
         self.lexpos = 0
         self.lexcol = 1
         self.lineno = 1
         self.lexdata = ""
+        self._line_index = LineIndex("")
+
+        self.lexbase = 0  # offset of lexdata in the whole input (streaming)
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self._chunks = None
 
         self.num_tokens = 0
 
@@ -109,7 +715,7 @@ class Lexer(object):
             self.current_exclusive = state_name
         else:
             self.current_states_names.append(state_name)
-        self.current_token_rules = self._get_current_token_rules()  # update t_rules
+        self.current_rule_set = self._get_current_rule_set()  # update t_rules
 
 
     def end(self, state_name):
@@ -121,7 +727,7 @@ class Lexer(object):
             raise ValueError("cannot end an exclusive state: %s" % state_name)
         try:
             self.current_states_names.remove(state_name)
-            self.current_token_rules = self._get_current_token_rules()  # update t_rules
+            self.current_rule_set = self._get_current_rule_set()  # update t_rules
         except ValueError:
             # may want to raise an error
             pass
@@ -130,6 +736,101 @@ class Lexer(object):
     def input(self, text):
         '''Get user input for lexical analysis.'''
         self.lexdata = text
+        self.lexpos = 0
+        self.lexcol = self.lineno = 1
+        self.num_tokens = 0
+        self._line_index = LineIndex(text)
+        self.lexbase = 0
+        self._chunks = None
+
+
+    def input_file(self, path):
+        '''Lex the contents of the file at path in place: the file is
+        memory-mapped, so it is neither read nor decoded up front
+        (bytes mode only).'''
+        if not self.bytes_mode:
+            raise ValueError("input_file() requires a lexer in bytes mode")
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # an empty file can't be mapped
+                data = ""
+        self.input(data)
+
+
+    def input_stream(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''Get user input from a file object (or an iterable of strings).
+        The input is read chunk by chunk and only a sliding window of it is
+        kept in lexdata: the consumed text is thrown away and at least
+        chunk_size characters are kept ahead of lexpos. Token's lexpos is
+        an index into the whole input.
+
+        The window is extended as long as a match could go on past its end
+        (see LexRuleSet.reaches_end), so the tokens are the same as those
+        of input() whatever the chunk_size, and a token may be longer than
+        the window. If a rule of the active states is not regular (see
+        dfa.is_regular: anchors, lookaround, backreferences...), this is
+        guessed: then a token, and a failed match of a rule tried before
+        it, must be decided within chunk_size characters.'''
+        if self.lazy_positions:
+            raise ValueError("lazy positions require the whole input, use input()")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.input("")
+        if hasattr(source, "read"):
+            source = iter(partial(source.read, chunk_size), "")
+        self._chunks = iter(source)
+        self.chunk_size = chunk_size
+
+
+    def checkpoint(self, token_num):
+        '''Return the state of the lexer (a LexCheckpoint) before the
+        token token_num.'''
+        return LexCheckpoint(token_num, self.lexbase + self.lexpos, self.lineno, self.lexcol,
+                             tuple(self.current_states_names), self.current_exclusive)
+
+
+    def restore(self, checkpoint):
+        '''Continue lexing the input from a checkpoint.'''
+        self.lexpos = checkpoint.lexpos - self.lexbase
+        self.lineno, self.lexcol = checkpoint.lineno, checkpoint.col
+        self.current_states_names = list(checkpoint.states)
+        self.current_exclusive = checkpoint.exclusive
+        self.current_rule_set = self._get_current_rule_set()
+
+
+    def _refill(self):
+        '''Drop the consumed text and read ahead (streaming input only).'''
+        if self.lexpos >= self.chunk_size:
+            self.lexbase += self.lexpos
+            self.lexdata = self.lexdata[self.lexpos:]
+            self.lexpos = 0
+        while len(self.lexdata) - self.lexpos < self.chunk_size:
+            if not self._read_chunk():
+                break
+
+
+    def _needs_more_input(self, m):
+        '''Return True if the match m (None if no rule matched) at lexpos
+        may change when the next chunk is read. If the rules aren't all
+        regular, it is guessed: a match reaching the end of the window may
+        continue in the next chunk; a failed match is retried with up to 2
+        chunks of lookahead.'''
+        reaches_end = self.current_rule_set.reaches_end(self.lexdata, self.lexpos)
+        if reaches_end is not None:
+            return reaches_end
+        if m is None:
+            return len(self.lexdata) - self.lexpos < 2 * self.chunk_size
+        return m.end() == len(self.lexdata)
+
+
+    def _read_chunk(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._chunks = None  # input exhausted
+            return False
+        self.lexdata += chunk
+        return True
 
 
     def get_token(self):
@@ -140,9 +841,208 @@ class Lexer(object):
                 yield token
 
 
-    def _generate_token(self):
+    def tokenize(self):
+        '''Lex the (rest of the) input into a TokenBuffer. Rules defined by
+        strings are applied without creating LexToken objects.'''
+        buf = TokenBuffer(self)
+        while not self._finished_analysis():
+            self._tokenize_step(buf)
+        return buf
+
+
+    def _tokenize_step(self, buf):
+        '''Skip a run of ignored chars or lex one token (error) into buf.'''
         if self._ignored():
             return
+        rule, m = self._match_token_rules()
+        if m is None:
+            error_token = self._apply_error_rule()
+            if error_token is not None:
+                buf.errors.append(error_token)
+            return
+        lexeme, end = m.group(0), self.lexbase + m.end()
+        if rule.is_string_rule and rule.default_token_id is not None:
+            buf.append(rule.default_token_id, self.lexbase + self.lexpos, end,
+                       None if self.lazy_positions else self.lineno, self.lexcol, lexeme)
+            self.num_tokens += 1
+        else:
+            token = self._apply_rule(rule, lexeme)
+            if token is not None:
+                buf.append_token(token, end, lexeme)
+                self.num_tokens += 1
+        self._process_text(lexeme)
+
+
+    def tokenize_parallel(self, text, workers=None, boundary=None, chunk_size=None):
+        '''Lex text into a TokenBuffer using a pool of worker processes
+        (only for lexers without states other than INITIAL).
+
+        The text is split into chunks of about chunk_size characters right
+        after a match of the boundary regexp (a newline by default), each
+        chunk is lexed in a worker and the results are stitched together.
+        A worker finishes the token that spans the end of its chunk; if
+        the worker of the next chunk didn't start on a token boundary (eg
+        inside a string with newlines), the lexer re-lexes from there until
+        it produces a token that the worker produced too.'''
+        if len(self.states) > 1:
+            raise ValueError("parallel lexing supports the INITIAL state only")
+        workers = workers or multiprocessing.cpu_count()
+        if chunk_size is None:
+            chunk_size = max(len(text) // (4 * workers), DEFAULT_CHUNK_SIZE)
+        self.input(text)
+        chunks = self._split_input(text, boundary, chunk_size)
+        if workers == 1 or len(chunks) == 1:
+            return self.tokenize()
+
+        global _parallel_job
+        _parallel_job = (self, text)  # inherited by the forked workers
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(_lex_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+            _parallel_job = None
+
+        self.input(text)
+        parts = [self._import_chunk(result, text, self.line_index()) for result in results]
+        buf = self._stitch(chunks, parts)
+        self.lexpos, self.num_tokens = len(text), len(buf)
+        return buf
+
+
+    def tokenize_many(self, texts, workers=None, chunksize=1, ordered=True):
+        '''Lex many texts using a pool of worker processes, yielding a
+        BatchResult(index, tokens, error) per text, where tokens is a
+        TokenBuffer and error is the message of an exception raised while
+        lexing the text (the lex errors are in tokens.errors). The workers
+        are forked, so the lexer is built once. See utils.map_batch.'''
+        pending = {}  # index => text (the texts are not sent back)
+        def remember(texts):
+            for index, text in enumerate(texts):
+                pending[index] = text
+                yield text
+
+        for res in map_batch(self._export_tokens, remember(texts), workers, chunksize, ordered):
+            text = pending.pop(res.index)
+            if res.error is None:
+                res = res._replace(result=self._import_chunk(res.result, text, LineIndex(text)))
+            yield res
+
+
+    def _export_tokens(self, text):
+        self.input(text)
+        return _export_buffer(self, self.tokenize(), positions=True)
+
+
+    def _split_input(self, text, boundary, chunk_size):
+        '''Return chunks (start, end, lineno, col) of text starting right
+        after the matches of the boundary regexp.'''
+        if boundary is None:
+            boundary = "\n"
+        if isinstance(boundary, basestring):
+            boundary = re.compile(boundary)
+        starts, pos = [0], chunk_size
+        while pos < len(text):
+            m = boundary.search(text, pos)
+            if m is None or m.end() >= len(text):
+                break
+            if m.end() > starts[-1]:
+                starts.append(m.end())
+            pos = max(m.end(), starts[-1] + chunk_size)
+        chunks, lineno, col = [], 1, 1
+        ends = starts[1:] + [len(text)]
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            chunks.append((start, end, lineno, col))
+            lineno, col = advance_position(lineno, col, text[start:end])
+        return chunks
+
+
+    def _import_chunk(self, result, text, lines):
+        '''Build a TokenBuffer of text (whose LineIndex is lines) from a
+        worker result.'''
+        arrays, values, errors = result
+        buf = TokenBuffer(self)
+        buf.data, buf.lines = text, lines
+        buf.types, buf.starts, buf.ends, buf.linenos, buf.cols = arrays
+        buf.values = values
+        for lexpos, lineno, pos, error_msg, is_view, value in errors:
+            token = LexError()
+            token.lexer, token.error_msg, token.lines = self, error_msg, lines
+            token.lexpos, token.lineno, token.pos = lexpos, lineno, pos
+            token.value = LexDataView(text, lexpos) if is_view else value
+            buf.errors.append(token)
+        return buf
+
+
+    def _stitch(self, chunks, parts):
+        '''Join the buffers of the chunks. A worker lexes past the end of
+        its chunk up to the first item (token or error) starting at the
+        seam or later; if the next worker has an item at the same offset,
+        it is in sync with the serial lexer from there on. Otherwise the
+        lexer re-lexes from that offset until it reaches an item of a
+        worker.'''
+        buf, k = parts[0], 1
+        while k < len(parts):
+            seam = self._first_item_at(buf, chunks[k][0])
+            if seam is None:  # the input ended before the seam
+                break
+            lexpos, lineno, col = seam
+            buf.truncate(lexpos)
+            if parts[k].has_item_at(lexpos):
+                parts[k].truncate(lexpos, keep="after")
+                buf.extend(parts[k], len(parts[k]))
+                k += 1
+            else:
+                k = self._relex_seam(buf, chunks, parts, k, seam)
+        return buf
+
+
+    def _first_item_at(self, buf, offset):
+        '''Return (lexpos, lineno, col) of the first item of buf starting
+        at offset or later (None if there is none).'''
+        items = []
+        i = bisect_right(buf.starts, offset - 1)
+        if i < len(buf):
+            lineno, col = (buf.linenos[i], buf.cols[i]) if buf.linenos else (None, None)
+            items.append((buf.starts[i], lineno, col))
+        e = buf.first_error(offset)
+        if e < len(buf.errors):
+            e = buf.errors[e]
+            lineno, col = (None, None) if self.lazy_positions else (e.lineno, e.pos)
+            items.append((e.lexpos, lineno, col))
+        return min(items) if items else None
+
+
+    def _relex_seam(self, buf, chunks, parts, k, (lexpos, lineno, col)):
+        '''Lex serially from lexpos until an item starts where an item of a
+        worker does; append the rest of that worker's buffer. Return the
+        index of the next chunk to join.'''
+        self.lexpos, self.lineno, self.lexcol = lexpos, lineno, col
+        relexed = TokenBuffer(self)
+        while not self._finished_analysis():
+            num_items = len(relexed) + len(relexed.errors)
+            self._tokenize_step(relexed)
+            if len(relexed) + len(relexed.errors) == num_items:
+                continue  # ignored chars
+            start = max(relexed.starts[-1] if len(relexed) else -1,
+                        relexed.errors[-1].lexpos if relexed.errors else -1)
+            while k + 1 < len(parts) and start >= chunks[k + 1][0]:
+                k += 1  # chunk k lies inside a single token
+            if start > lexpos and parts[k].has_item_at(start):
+                relexed.truncate(start)
+                buf.extend(relexed, len(relexed))
+                parts[k].truncate(start, keep="after")
+                buf.extend(parts[k], len(parts[k]))
+                return k + 1
+        buf.extend(relexed, len(relexed))
+        return len(parts)
+
+
+    def _generate_token(self):
+        while self._ignored():
+            if self._finished_analysis():
+                return
 
         token, match_obj = self._apply_token_rules()
         if match_obj is not None:
@@ -157,18 +1057,18 @@ class Lexer(object):
 
     def _process_text(self, text):
         self.lexpos += len(text)
-        for char in text:
-            self._process_char(char)
+        if not self.lazy_positions:
+            self.lineno, self.lexcol = advance_position(self.lineno, self.lexcol, text)
 
 
-    def _process_char(self, char):
-        if char == '\n':
-            self.lineno += 1
-            self.lexcol = 1
-        elif char == '\t':
-            self.lexcol = self.lexcol + 8 - ((self.lexcol - 1) % 8)
-        else:
-            self.lexcol += 1
+    def line_index(self):
+        '''Return the LineIndex of the input.'''
+        return self._line_index
+
+
+    def position(self, lexpos):
+        '''Return (lineno, col) of the index lexpos of the input.'''
+        return self.line_index().position(lexpos)
 
 
     def token(self):
@@ -181,7 +1081,12 @@ class Lexer(object):
 
 
     def _finished_analysis(self):
-        return self.lexpos >= len(self.lexdata)
+        if self._chunks is not None:
+            self._refill()
+        if self.lexpos < len(self.lexdata):
+            return False
+        self._save_tables()  # of the combinations of states met while lexing
+        return True
 
 
     def _apply_error_rule(self):
@@ -195,26 +1100,43 @@ class Lexer(object):
 
 
     def _apply_token_rules(self):
-        for rule in self.current_token_rules:
-            m = re.match(rule.regexp, self.lexdata[self.lexpos:])
-            if m is not None:
-                token = self._make_default_token(type=self._extract_default_token_name(rule),
-                                                 value=m.group(0))
-                token = rule(token)
-                if token is not None and token.type not in self.token_names:
-                    raise ValueError("unknown token name %s found under the rule %s" % (token.type,
-                                                                                         rule.__name__))
-                return token, m
+        rule, m = self._match_token_rules()
+        if m is not None:
+            return self._apply_rule(rule, m.group(0)), m
         return None, None
 
 
+    def _match_token_rules(self):
+        rule, m = self.current_rule_set.match(self.lexdata, self.lexpos)
+        while self._chunks is not None and self._needs_more_input(m):
+            if not self._read_chunk():
+                break
+            rule, m = self.current_rule_set.match(self.lexdata, self.lexpos)
+        return rule, m
+
+
+    def _apply_rule(self, rule, lexeme):
+        token = self._make_default_token(type=self._extract_default_token_name(rule),
+                                         value=lexeme)
+        token = rule(token)
+        if token is not None:
+            token.type_id = self.token_ids.get(token.type)
+            if token.type_id is None:
+                raise ValueError("unknown token name %s found under the rule %s" % (token.type,
+                                                                                     rule.__name__))
+        return token
+
+
     def _ignored(self):
-        ch = self.lexdata[self.lexpos]
-        ignore_string = self._get_regexp_for_rule(self._get_current_ignore_rule())
-        if ch in ignore_string:
-            self.skip()
-            return True
-        return False
+        '''Skip a run of ignored characters; return True if there was one.'''
+        ignore_regexp = self.states[self.current_exclusive].ignore_regexp
+        if ignore_regexp is None:
+            return False
+        m = ignore_regexp.match(self.lexdata, self.lexpos)
+        if m is None:
+            return False
+        self._process_text(m.group(0))
+        return True
 
 
     def skip(self, n=1):
@@ -224,9 +1146,49 @@ class Lexer(object):
             self._process_text(skipped_text)
 
 
-    def _get_current_token_rules(self):
+    def _get_current_rule_set(self):
+        '''Return the compiled rule set of the active states.'''
+        return self._get_rule_set(self.current_states_names)
+
+
+    def _get_rule_set(self, states_names):
+        '''Return the compiled rule set of states_names (built once per
+        combination of states; its tables are saved by _save_tables).'''
+        key = frozenset(states_names)
+        rule_set = self._rule_sets.get(key)
+        if rule_set is None:
+            tables = self._tables.get(key)
+            rule_set = self._rule_sets[key] = self.rule_set_class(self._get_token_rules(states_names),
+                                                                  tables)
+            if tables is None and self.cachefile is not None:
+                self._tables[key] = rule_set.tables()
+                self._unsaved_tables = True
+        return rule_set
+
+
+    def _save_tables(self):
+        '''Write the tables of the rule sets to the cache file if some of
+        them aren't saved yet.'''
+        if self._unsaved_tables:
+            save_cache(self.cachefile, self.signature(), self._tables)
+            self._unsaved_tables = False
+
+
+    def signature(self):
+        '''Return a hash of the tokens, states and rules of the lexer.'''
+        rules = sorted(self.rules_index, key=self.rules_index.get)
+        states = [(name, lexstate.type, lexstate.ignore_chars,
+                   [rule.__name__ for rule in lexstate.rules])
+                  for name, lexstate in sorted(self.states.items())]
+        return signature(self.rule_set_class.__name__, self.bytes_mode, self.encoding,
+                         tuple(self.token_names), states,
+                         [(rule.__name__, rule.regexp.pattern, rule.regexp.flags)
+                          for rule in rules if hasattr(rule, "regexp")])
+
+
+    def _get_token_rules(self, states_names):
         res = []
-        for state_name in self.current_states_names:
+        for state_name in states_names:
             lexstate = self.states[state_name]
             for rule in lexstate.rules:
                 res.append(rule)
@@ -239,11 +1201,6 @@ class Lexer(object):
         return lexstate.error
 
 
-    def _get_current_ignore_rule(self):
-        lexstate = self.states[self.current_exclusive]
-        return lexstate.ignore
-
-
     def _exclusive_state(self, lexstate):
         '''Return True if a LexState is exclusive.'''
         return lexstate.type == "exclusive"
@@ -252,18 +1209,27 @@ class Lexer(object):
     def _make_default_token(self, type=None, value=None):
         token = LexToken()
         token.lexer, token.value, token.type = self, value, type
-        token.lineno, token.pos = self.lineno, self.lexcol
+        self._set_token_position(token)
         return token
 
     def _make_default_error_token(self, error_msg=""):
         token = LexError()
         token.lexer = self
         token.error_msg = error_msg
-        token.lineno, token.pos = self.lineno, self.lexcol
-        token.value = self.lexdata[self.lexpos:]
+        self._set_token_position(token)
+        token.value = LexDataView(self.lexdata, self.lexpos)  # rest of the input
         return token
 
 
+    def _set_token_position(self, token):
+        token.lexpos = self.lexbase + self.lexpos
+        if self.lazy_positions:
+            token.lineno = token.pos = None  # computed when first read
+            token.lines = self._line_index
+        else:
+            token.lineno, token.pos = self.lineno, self.lexcol
+
+
     def _extract_default_token_name(self, rule):
         '''E.g: t_NUMBER => NUMBER, t_comment_begin => begin
         if 'comment' is a valid state.'''
@@ -274,13 +1240,230 @@ class Lexer(object):
 lex = Lexer  # type alias
 
 
+
+
+class ColumnShift(object):
+    '''The columns of the items after an edit on the line where the lexer
+       stopped re-lexing: at the offset lexpos of the edited text, the
+       column old_col became new_col. Up to the first tab or newline after
+       lexpos the columns move by the same number; past a tab they are
+       computed from the text, advancing from the previous item.'''
+
+    def __init__(self, text, lexpos, old_col, new_col):
+        self.text, self.delta = text, new_col - old_col
+        line_end = text.find('\n', lexpos)
+        if line_end < 0:
+            line_end = len(text)
+        tab = text.find('\t', lexpos, line_end)
+        self.tab = line_end if tab < 0 else tab
+        self.tab_col = new_col + self.tab - lexpos
+        self.pos, self.col = self.tab, self.tab_col  # the last column computed past the tab
+
+
+    def column(self, offset, col):
+        '''Return the new column of the item at offset (of the edited text)
+        that was at column col.'''
+        if offset <= self.tab:
+            return col + self.delta
+        if offset < self.pos:
+            self.pos, self.col = self.tab, self.tab_col
+        self.col = advance_position(1, self.col, self.text[self.pos:offset])[1]
+        self.pos = offset
+        return self.col
+
+
+    def shift(self, cols, starts, lo, hi):
+        '''Move the columns cols[lo:hi] of the items at the (increasing)
+        offsets starts[lo:hi].'''
+        k = bisect_right(starts, self.tab, lo, hi)
+        if self.delta:
+            cols[lo:k] = array('i', [c + self.delta for c in cols[lo:k]])
+        for i in xrange(k, hi):
+            cols[i] = self.column(starts[i], cols[i])
+
+
+
+
+class LexSession(object):
+    '''The tokens of a text that is edited. A checkpoint of the lexer is
+       taken every 'interval' tokens; edit() re-lexes the text from the
+       last checkpoint before the edit up to the first checkpoint after it
+       that the lexer reaches in the same states (then the rest of the
+       tokens are the same, shifted), so it takes time proportional to the
+       size of the edit (plus the shift of the token offsets).
+
+       A token is assumed to depend on the text up to one char past its
+       end; as a failed match may have read up to the end of the input,
+       the text is re-lexed from the first lex error before the edit.'''
+
+    def __init__(self, lexer, text, interval=CHECKPOINT_INTERVAL):
+        '''Lex text from the initial state of the lexer.'''
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.lexer, self.interval = lexer, interval
+        self.text = text
+        initial = lexer._default_state_name()
+        self.checkpoints = [LexCheckpoint(0, 0, 1, 1, (initial,), initial)]
+        lexer.input(text)
+        lexer.restore(self.checkpoints[0])
+        self.tokens = TokenBuffer(lexer)
+        self._relex(self.tokens, self.checkpoints, [], 0)
+
+
+    def edit(self, start, end, replacement):
+        '''Replace text[start:end] with replacement and update the tokens.
+        Return (first, old_end, new_end): the tokens first..old_end-1 were
+        replaced by the tokens first..new_end-1.'''
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError("edit out of range: %d-%d" % (start, end))
+        text = self.text[:start] + replacement + self.text[end:]
+        delta = len(replacement) - (end - start)
+        old, checkpoints = self.tokens, self.checkpoints
+
+        # a token ending at start may be extended, and a match may have looked
+        # at the next char: restart at the token before the one reaching start;
+        # a failed match (an error) may have looked up to the end of the input
+        k = max(bisect_left(old.ends, start) - 1, 0)
+        limit = min(old.starts[k], start) if k < len(old) else start
+        if old.errors and old.errors[0].lexpos < start:
+            limit = min(limit, old.errors[0].lexpos)
+        c = bisect_right(checkpoints, (k, sys.maxint)) - 1
+        while checkpoints[c].lexpos > limit:  # checkpoints before the same token
+            c -= 1
+        after = self._first_checkpoint(end, c + 1)
+        later = checkpoints[after:]  # past the edit
+        self.lexer.input(text)
+        self.lexer.restore(checkpoints[c])
+        new = TokenBuffer(self.lexer)
+        new_checkpoints = checkpoints[:c + 1]
+        sync = self._relex(new, new_checkpoints, later, delta)
+
+        first = checkpoints[c].token_num
+        if sync is None:  # the text was re-lexed to the end
+            old_end, old_lexpos, shift = len(old), len(self.text), (0, None, None)
+        else:
+            old_end, old_lexpos = sync.token_num, sync.lexpos
+            shift = (self.lexer.lineno - sync.lineno if sync.lineno is not None else 0,
+                     sync.lineno,
+                     ColumnShift(text, sync.lexpos + delta, sync.col, self.lexer.lexcol))
+        new_end = first + len(new)
+        same_before, same_after = self._unchanged(old, new, first, old_end, start, end, delta)
+
+        old.replace(first, old_end, new, (checkpoints[c].lexpos, old_lexpos, delta), shift)
+        if sync is not None:
+            lines, line, columns = shift
+            moved = new_end - old_end
+            rest = checkpoints[checkpoints.index(sync, after):]
+            if moved or delta or lines or columns.delta:
+                rest = [cp._replace(token_num=cp.token_num + moved, lexpos=cp.lexpos + delta,
+                                    lineno=cp.lineno + lines if cp.lineno is not None else None,
+                                    col=columns.column(cp.lexpos + delta, cp.col)
+                                    if cp.lineno == line else cp.col)
+                        for cp in rest]
+            new_checkpoints.extend(rest)
+        self.text, self.checkpoints = text, new_checkpoints
+        return first + same_before, old_end - same_after, new_end - same_after
+
+
+    def _relex(self, buf, checkpoints, later, delta):
+        '''Lex into buf (the tokens from checkpoints[-1]) from the state of
+        the lexer, taking checkpoints. Stop at the first of the later
+        checkpoints (of the text before the edit, shifted by delta) the
+        lexer reaches in the same states and return it; None if the
+        lexer reaches the end of the input.'''
+        lexer, first = self.lexer, checkpoints[-1].token_num
+        j = 0
+        while not lexer._finished_analysis():
+            while j < len(later) and later[j].lexpos + delta < lexer.lexpos:
+                j += 1
+            if (j < len(later) and later[j].lexpos + delta == lexer.lexpos and
+                later[j].states == tuple(lexer.current_states_names) and
+                later[j].exclusive == lexer.current_exclusive):
+                return later[j]
+            token_num = first + len(buf)
+            if token_num >= checkpoints[-1].token_num + self.interval:
+                checkpoints.append(lexer.checkpoint(token_num))
+            lexer._tokenize_step(buf)
+        return None
+
+
+    def _first_checkpoint(self, offset, lo):
+        '''Return the index of the first checkpoint at offset or later
+        (from lo).'''
+        checkpoints, hi = self.checkpoints, len(self.checkpoints)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if checkpoints[mid].lexpos < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def _unchanged(self, old, new, first, old_end, start, end, delta):
+        '''Return the numbers of the re-lexed tokens equal to the old ones
+        at the start and at the end of the replaced tokens.'''
+        same = lambda i, j, shift: (old.types[i] == new.types[j] and
+                                    old.starts[i] + shift == new.starts[j] and
+                                    old.ends[i] + shift == new.ends[j] and
+                                    old.value(i) == new.value(j))
+        before = 0
+        while (before < min(old_end - first, len(new)) and
+               old.ends[first + before] <= start and same(first + before, before, 0)):
+            before += 1
+        after = 0
+        while (after < min(old_end - first, len(new)) - before and
+               old.starts[old_end - 1 - after] >= end and
+               same(old_end - 1 - after, len(new) - 1 - after, delta)):
+            after += 1
+        return before, after
+
+
+
+_parallel_job = None  # (lexer, text) shared with the forked workers
+
+
+def _lex_chunk((start, end, lineno, col)):
+    '''Lex text from start in a worker process up to the first item at end
+    or later (see tokenize_parallel).'''
+    lexer, text = _parallel_job
+    lexer.input(text)
+    lexer.lexpos, lexer.lineno, lexer.lexcol = start, lineno, col
+    buf = TokenBuffer(lexer)
+    last_item = -1
+    while last_item < end and not lexer._finished_analysis():
+        lexer._tokenize_step(buf)
+        last_item = max(buf.starts[-1] if len(buf) else -1,
+                        buf.errors[-1].lexpos if buf.errors else -1)
+    return _export_buffer(lexer, buf)
+
+
+def _export_buffer(lexer, buf, positions=False):
+    '''Return the picklable contents of a TokenBuffer (see _import_chunk);
+    if positions is True, the positions are computed for lazy lexers too.
+    An error value that is a view of the rest of the input is not sent
+    (is_view is set instead).'''
+    if lexer.lazy_positions and positions:
+        for start in buf.starts:
+            lineno, col = lexer.position(start)
+            buf.linenos.append(lineno)
+            buf.cols.append(col)
+    errors = []
+    for e in buf.errors:
+        lineno, pos = (None, None) if lexer.lazy_positions and not positions else (e.lineno, e.pos)
+        is_view = isinstance(e.value, LexDataView)
+        errors.append((e.lexpos, lineno, pos, e.error_msg, is_view, None if is_view else e.value))
+    return (buf.types, buf.starts, buf.ends, buf.linenos, buf.cols), buf.values, errors
+
+
 class LexerInfo(object):
     '''LexerInfo class is responsible for extracting all information
        required for conducting lexical analysis (ie extracting tokens,
        states, token_rules). It also preprocess the info and performs
        error handling.'''
     
-    def __init__(self, module=None):
+    def __init__(self, module=None, bytes_mode=False, encoding="utf-8"):
+        self.bytes_mode, self.encoding = bytes_mode, encoding
         token_names, states, rules = self.get_lexer_variables(module)
         token_names, rules = token_names[-1], map(self._convert_rule, rules)
         states = states[-1] if states else []
@@ -288,6 +1471,7 @@ class LexerInfo(object):
         self._check_token_state_names(token_names, states)
         
         self.token_names = token_names
+        self.token_ids = {name: i for i, name in enumerate(token_names)}  # interned
         self.states = self._convert_to_states(states)
         self._assign_rules(rules)
 
@@ -361,8 +1545,21 @@ class LexerInfo(object):
         '''Precompile rules' regexps and sets a default_token_name attribute.'''
         for lexstate in self.states.values():
             for rule in lexstate.rules:
-                rule.regexp = re.compile(self._get_regexp_for_rule(rule))
+                rule.regexp = re.compile(self._get_pattern(rule))
                 self.set_default_token_name(rule)
+            if lexstate.ignore is not None:
+                lexstate.ignore_chars = chars = self._get_pattern(lexstate.ignore)
+                if chars:
+                    lexstate.ignore_regexp = re.compile(
+                        "[%s]+" % "".join(re.escape(ch) for ch in chars))
+
+
+    def _get_pattern(self, rule):
+        '''Return rule's docstring (encoded to bytes in bytes mode).'''
+        pattern = self._get_regexp_for_rule(rule)
+        if self.bytes_mode and isinstance(pattern, unicode):
+            pattern = pattern.encode(self.encoding)
+        return pattern
 
 
     def set_default_token_name(self, rule):
@@ -371,6 +1568,7 @@ class LexerInfo(object):
             prefix += rule.state_name + "_"
         default_name = rule.__name__[len(prefix):]
         rule.default_token_name = default_name
+        rule.default_token_id = self.token_ids.get(default_name)  # None if unknown
                 
                 
     def check_rules_regexps(self):
@@ -467,7 +1665,10 @@ class LexerInfo(object):
         '''If rule (name, value) is a function, return it as it is,
         otherwise convert string to a func.'''
         name, value = rule
-        if callable(value): return value
+        if callable(value):
+            value.is_string_rule = False
+            return value
         f = lambda t: t
         f.__name__, f.__doc__ = name, value
+        f.is_string_rule = True
         return f
@@ -0,0 +1,8 @@
+'''Ambiguous arithmetic grammar: both operators are left undeclared, so
+LALR has shift/reduce conflicts.'''
+from calc_lex import tokens
+
+
+def p_exp(p):
+    '''EXP : EXP plus EXP | EXP times EXP | num'''
+    p[0] = p[1] if len(p) == 2 else (p[2], p[1], p[3])
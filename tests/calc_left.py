@@ -0,0 +1,17 @@
+'''Left-recursive arithmetic grammar (not LL(1)).'''
+from calc_lex import tokens
+
+
+def p_exp(p):
+    '''EXP : EXP plus TERM | TERM'''
+    p[0] = p[1] if len(p) == 2 else ("+", p[1], p[3])
+
+
+def p_term(p):
+    '''TERM : TERM times FACTOR | FACTOR'''
+    p[0] = p[1] if len(p) == 2 else ("*", p[1], p[3])
+
+
+def p_factor(p):
+    '''FACTOR : lp EXP rp | num'''
+    p[0] = p[1] if len(p) == 2 else p[2]
@@ -0,0 +1,25 @@
+'''Lexer of the arithmetic grammars of the tests.'''
+tokens = ("num", "plus", "times", "lp", "rp")
+
+t_ignore = " \t"
+t_plus = r'\+'
+t_times = r'\*'
+t_lp = r'\('
+t_rp = r'\)'
+
+
+def t_num(t):
+    r'[0-9]+'
+    t.value = int(t.value)
+    return t
+
+
+def t_newline(t):
+    r'\n+'
+
+
+def t_error(t):
+    t.lexer.skip(1)
+    t.value = t.value[0]
+    t.error_msg = "unknown char"
+    return t
@@ -0,0 +1,34 @@
+'''The arithmetic grammar of calc_left, rewritten to be LL(1); the values
+are the same.'''
+from calc_lex import tokens
+
+
+def fold(first, rest):
+    for op, operand in rest:
+        first = (op, first, operand)
+    return first
+
+
+def p_exp(p):
+    '''EXP : TERM EXP_REST'''
+    p[0] = fold(p[1], p[2])
+
+
+def p_exp_rest(p):
+    '''EXP_REST : plus TERM EXP_REST | '''
+    p[0] = [("+", p[2])] + p[3] if len(p) == 4 else []
+
+
+def p_term(p):
+    '''TERM : FACTOR TERM_REST'''
+    p[0] = fold(p[1], p[2])
+
+
+def p_term_rest(p):
+    '''TERM_REST : times FACTOR TERM_REST | '''
+    p[0] = [("*", p[2])] + p[3] if len(p) == 4 else []
+
+
+def p_factor(p):
+    '''FACTOR : lp EXP rp | num'''
+    p[0] = p[1] if len(p) == 2 else p[2]
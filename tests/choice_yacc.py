@@ -0,0 +1,18 @@
+'''A grammar with nullable and overlapping alternatives: the RD parser
+tries them in order.'''
+from letters_lex import tokens
+
+
+def p_s(p):
+    '''S : OPT a REST | b b'''
+    p[0] = ("S",) + tuple(p[1:])
+
+
+def p_opt(p):
+    '''OPT : b | '''
+    p[0] = ("OPT",) + tuple(p[1:])
+
+
+def p_rest(p):
+    '''REST : x REST | x y | '''
+    p[0] = ("REST",) + tuple(p[1:])
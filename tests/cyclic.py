@@ -0,0 +1,17 @@
+'''A cyclic grammar: A derives itself (directly and through B).'''
+from letters_lex import tokens
+
+
+def p_s(p):
+    '''S : A'''
+    p[0] = p[1]
+
+
+def p_a(p):
+    '''A : A | B | a'''
+    p[0] = ("A", p[1])
+
+
+def p_b(p):
+    '''B : A'''
+    p[0] = ("B", p[1])
@@ -0,0 +1,16 @@
+'''Lexer of the function definitions of the README.'''
+tokens = ("string", "lparen", "rparen", "equal", "comma", "plus")
+
+t_ignore = " "
+t_string = r'[a-z]+'
+t_lparen = r'\('
+t_rparen = r'\)'
+t_equal = r'='
+t_comma = r','
+t_plus = r'\+'
+
+
+def t_error(t):
+    t.lexer.skip(1)
+    t.value = t.value[0]
+    return t
@@ -0,0 +1,29 @@
+'''The grammar of function definitions of the README (ARGS_LIST is
+nullable).'''
+from funcs_lex import tokens
+
+
+def p_func_def(p):
+    '''DEF : string lparen ARGS_LIST rparen equal EXP_SUM'''
+    p[0] = ("function", p[1], p[3], p[6])
+
+
+def p_args_list(p):
+    '''ARGS_LIST : NONEMPTY_LIST
+                 | '''
+    p[0] = ("args", []) if len(p) == 1 or p[1] == [] else ("args", p[1])
+
+
+def p_args_nonempty(p):
+    '''NONEMPTY_LIST : string comma NONEMPTY_LIST | string'''
+    p[0] = [p[1]] + p[3] if len(p) == 4 else [p[1]]
+
+
+def p_exp_sum(p):
+    '''EXP_SUM : EXP'''
+    p[0] = ("sum", p[1])
+
+
+def p_exp(p):
+    '''EXP : EXP plus string | string'''
+    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
@@ -0,0 +1,20 @@
+'''Lexer of the small grammars of the tests (single letter tokens).'''
+tokens = ("a", "b", "x", "y", "z", "plus", "times", "lp", "rp", "num")
+
+t_ignore = " "
+t_a = r'a'
+t_b = r'b'
+t_x = r'x'
+t_y = r'y'
+t_z = r'z'
+t_plus = r'\+'
+t_times = r'\*'
+t_lp = r'\('
+t_rp = r'\)'
+t_num = r'[0-9]'
+
+
+def t_error(t):
+    t.lexer.skip(1)
+    t.value = t.value[0]
+    return t
@@ -0,0 +1,12 @@
+'''A left-recursive list that appends to the value of the recursive call
+in place.'''
+from letters_lex import tokens
+
+
+def p_list(p):
+    '''LIST : LIST plus num | num'''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
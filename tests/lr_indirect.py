@@ -0,0 +1,12 @@
+'''Indirect left recursion: A and B are both heads of left recursion.'''
+from letters_lex import tokens
+
+
+def p_a(p):
+    '''A : B x | a'''
+    p[0] = ("A",) + tuple(p[1:])
+
+
+def p_b(p):
+    '''B : A y | B z | b'''
+    p[0] = ("B",) + tuple(p[1:])
@@ -0,0 +1,17 @@
+'''Left recursion through a nullable nonterminal (L calls S after OPT).'''
+from letters_lex import tokens
+
+
+def p_s(p):
+    '''S : L x | a'''
+    p[0] = ("S",) + tuple(p[1:])
+
+
+def p_l(p):
+    '''L : L z | OPT S y | b'''
+    p[0] = ("L",) + tuple(p[1:])
+
+
+def p_opt(p):
+    '''OPT : '''
+    p[0] = "opt"
@@ -0,0 +1,22 @@
+'''An ambiguous grammar where every nonterminal is nullable.'''
+from letters_lex import tokens
+
+
+def p_s(p):
+    '''S : A B C | S num'''
+    p[0] = ("S",) + tuple(p[1:])
+
+
+def p_a(p):
+    '''A : a | '''
+    p[0] = ("A",) + tuple(p[1:])
+
+
+def p_b(p):
+    '''B : A A | C plus | '''
+    p[0] = ("B",) + tuple(p[1:])
+
+
+def p_c(p):
+    '''C : B | a C | '''
+    p[0] = ("C",) + tuple(p[1:])
@@ -0,0 +1,30 @@
+'''A lexer whose rules overlap, so their order matters; two of them can't
+be a part of a master regexp (a backreference and an inline flag).'''
+tokens = ("kw", "upper", "repeat", "num", "name")
+
+t_ignore = " "
+
+
+def t_kw(t):
+    r'if|else'
+    return t
+
+
+def t_upper(t):
+    r'(?i)up[a-z]*'
+    return t
+
+
+def t_repeat(t):
+    r'([0-9])\1+'
+    return t
+
+
+t_num = r'[0-9]+'
+t_name = r'[a-zA-Z]+'
+
+
+def t_error(t):
+    t.lexer.skip(1)
+    t.value = t.value[0]
+    return t
@@ -0,0 +1,7 @@
+'''A right-recursive list (Leo items make it linear for the Earley parser).'''
+from letters_lex import tokens
+
+
+def p_list(p):
+    '''LIST : a LIST | a'''
+    p[0] = [p[1]] + (p[2] if len(p) == 3 else [])
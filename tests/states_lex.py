@@ -0,0 +1,65 @@
+'''A lexer with an exclusive (COMMENTS) and an inclusive (TAGS) state.'''
+tokens = ("INT", "WORD", "COMMENT", "TAG")
+states = (("COMMENTS", "exclusive"), ("TAGS", "inclusive"))
+
+t_ignore = " \t"
+t_COMMENTS_ignore = " "
+
+
+def t_comment(t):
+    r'/\*'
+    t.lexer.begin('COMMENTS')
+
+
+def t_COMMENTS_end(t):
+    r'\*/'
+    t.lexer.begin('INITIAL')
+
+
+def t_COMMENTS_body(t):
+    r'[^*]+|\*'
+    t.type = 'COMMENT'
+    return t
+
+
+def t_tagon(t):
+    r'<'
+    t.lexer.begin('TAGS')
+
+
+def t_TAGS_tag(t):
+    r'@[a-z]+'
+    t.type = 'TAG'
+    return t
+
+
+def t_TAGS_off(t):
+    r'>'
+    t.lexer.end('TAGS')
+
+
+def t_INT(t):
+    r'[0-9]+'
+    t.value = int(t.value)
+    return t
+
+
+t_WORD = r'[a-zA-Z_]+'
+
+
+def t_newline(t):
+    r'\n+'
+
+
+def t_error(t):
+    t.error_msg = "bad char"
+    t.value = t.value[0]
+    t.lexer.skip(1)
+    return t
+
+
+def t_COMMENTS_error(t):
+    t.error_msg = "bad comment char"
+    t.value = t.value[0]
+    t.lexer.skip(1)
+    return t
@@ -0,0 +1,7 @@
+'''An ambiguous sum: a text of n numbers has Catalan(n - 1) derivations.'''
+from letters_lex import tokens
+
+
+def p_e(p):
+    '''E : E plus E | num'''
+    p[0] = p[1] if len(p) == 2 else (p[1], p[3])
@@ -0,0 +1,15 @@
+'''Helpers of the tests.'''
+
+
+def dump_tokens(tokens):
+    '''Return a comparable description of the tokens and the lex errors of
+    a TokenBuffer (values are compared as strings, since the value of an
+    error may be a LexDataView).'''
+    return ([(t.type, t.value, t.lexpos, t.lineno, t.pos) for t in tokens],
+            [(e.lexpos, e.lineno, e.pos, e.error_msg, type(e.value).__name__, str(e.value))
+             for e in tokens.errors])
+
+
+def lex_all(lexer, text):
+    lexer.input(text)
+    return lexer.tokenize()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import lex
+import yacc
+import json_lex, json_yacc
+from support import dump_tokens, lex_all
+
+
+TEXT = u'{"name": "café €", "list": [1, 2.5, true],\n "x": "\tñ"} $'.encode("utf-8")
+
+
+class BytesModeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data):
+        path = os.path.join(self.dir, "input.json")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_same_tokens_as_text_mode(self):
+        lexer = lex.lex(module=json_lex, bytes_mode=True)
+        tokens = lex_all(lexer, TEXT)
+        expected = lex_all(lex.lex(module=json_lex), TEXT)  # str, so columns count bytes too
+        self.assertEqual(dump_tokens(tokens), dump_tokens(expected))
+        self.assertEqual(tokens[3].value, u"café €".encode("utf-8"))
+        self.assertEqual(tokens[3].text, u"café €")
+
+    def test_input_file(self):
+        lexer = lex.lex(module=json_lex, bytes_mode=True)
+        lexer.input_file(self.write(TEXT))
+        self.assertEqual(dump_tokens(lexer.tokenize()), dump_tokens(lex_all(lexer, TEXT)))
+
+    def test_parse(self):
+        lexer = lex.lex(module=json_lex, bytes_mode=True)
+        tree = yacc.yacc(module=json_yacc).parse(TEXT[:-2], lexer)
+        self.assertEqual(tree[1][0], ("pair", "name", u"café €".encode("utf-8")))
+
+    def test_empty_file(self):
+        lexer = lex.lex(module=json_lex, bytes_mode=True)
+        lexer.input_file(self.write(""))
+        self.assertEqual(len(lexer.tokenize()), 0)
+
+    def test_input_file_requires_bytes_mode(self):
+        self.assertRaises(ValueError, lex.lex(module=json_lex).input_file, self.write(TEXT))
+
+
+if __name__ == "__main__":
+    unittest.main()
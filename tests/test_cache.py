@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+import dfa
+import lex
+import yacc
+import calc_lex, calc_left, calc_amb, calc_ll1, json_lex, json_yacc, states_lex
+from support import dump_tokens, lex_all
+
+
+JSON = '[1, {"a": [true, null, "x"]}, 2.5, "\\u00e9"]'
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "tables.cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def without(self, owner, name):
+        '''Make owner.name raise, to check that the cached tables are used.'''
+        def fail(*args, **kwargs):
+            raise AssertionError("%s called" % name)
+        self.addCleanup(setattr, owner, name, getattr(owner, name))
+        setattr(owner, name, fail)
+
+    def check_lexer(self, engine, owner, builder):
+        expected = dump_tokens(lex_all(lex.lex(module=json_lex, engine=engine), JSON))
+        lexer = lex.lex(module=json_lex, engine=engine, cachefile=self.path)
+        self.assertEqual(dump_tokens(lex_all(lexer, JSON)), expected)
+        self.assertTrue(os.path.exists(self.path))
+        self.without(owner, builder)
+        lexer = lex.lex(module=json_lex, engine=engine, cachefile=self.path)
+        self.assertEqual(dump_tokens(lex_all(lexer, JSON)), expected)
+
+    def test_re_lexer(self):
+        self.check_lexer("re", dfa, "first_chars")
+
+    def test_dfa_lexer(self):
+        self.check_lexer("dfa", dfa.DFA, "_subset_construction")
+
+    def test_lexer_writes_the_file_once(self):
+        saves = []
+        def save_cache(*args):
+            saves.append(args[0])
+            original(*args)
+        original = lex.save_cache
+        self.addCleanup(setattr, lex, "save_cache", original)
+        lex.save_cache = save_cache
+        text = "a /* c */ <@x 1> b"
+        expected = dump_tokens(lex_all(lex.lex(module=states_lex, engine="dfa"), text))
+        lexer = lex.lex(module=states_lex, engine="dfa", cachefile=self.path)
+        self.assertEqual(saves, [self.path])  # the exclusive states
+        lexer.input(text)
+        tokens = []
+        while True:
+            token = lexer.token()
+            if token is None:
+                break
+            tokens.append(token)
+            self.assertEqual(len(saves), 1)  # not while lexing
+        self.assertEqual([(t.type, t.value) for t in tokens],
+                         [("WORD", "a"), ("COMMENT", "c "), ("TAG", "@x"), ("INT", 1),
+                          ("WORD", "b")])
+        self.assertEqual(len(saves), 2)  # INITIAL with TAGS, at the end of the input
+        lexer = lex.lex(module=states_lex, engine="dfa", cachefile=self.path)
+        self.without(dfa.DFA, "_subset_construction")
+        self.assertEqual(dump_tokens(lex_all(lexer, text)), expected)
+        self.assertEqual(len(saves), 2)
+
+    def test_lalr(self):
+        expected = yacc.yacc(parser="LALR", module=json_yacc).parse(JSON, json_lex.lexer)
+        yacc.yacc(parser="LALR", module=json_yacc, cachefile=self.path)
+        self.without(yacc.LALRParser, "_lr0_automaton")
+        parser = yacc.yacc(parser="LALR", module=json_yacc, cachefile=self.path)
+        self.assertEqual(parser.parse(JSON, json_lex.lexer), expected)
+
+    def test_ll1(self):
+        lexer = lex.lex(module=calc_lex)
+        yacc.yacc(parser="LL1", module=calc_ll1, cachefile=self.path)
+        self.without(yacc.LL1Parser, "_build_table")
+        parser = yacc.yacc(parser="LL1", module=calc_ll1, cachefile=self.path)
+        self.assertEqual(parser.parse("(1+2)*3", lexer), ("*", ("+", 1, 2), 3))
+
+    def test_changed_grammar_is_rebuilt(self):
+        lexer = lex.lex(module=calc_lex)
+        yacc.yacc(parser="LALR", module=calc_left, cachefile=self.path)
+        parser = yacc.yacc(parser="LALR", module=calc_amb, cachefile=self.path)
+        self.assertEqual(len(parser.parser.conflicts), 4)
+        self.assertEqual(parser.parse("1+2+3", lexer), ("+", 1, ("+", 2, 3)))
+        parser = yacc.yacc(parser="LALR", module=calc_left, cachefile=self.path)
+        self.assertEqual(parser.parser.conflicts, [])
+        self.assertEqual(parser.parse("1+2+3", lexer), ("+", ("+", 1, 2), 3))
+
+    def test_corrupt_file_is_rebuilt(self):
+        with open(self.path, "wb") as f:
+            f.write("garbage")
+        parser = yacc.yacc(parser="LALR", module=json_yacc, cachefile=self.path)
+        self.assertEqual(parser.parse("[1]", json_lex.lexer), ("elements", 1))
+        lexer = lex.lex(module=json_lex, cachefile=self.path)
+        self.assertEqual(len(lex_all(lexer, JSON)), 19)
+
+    def test_parser_without_tables(self):
+        with self.assertRaises(ValueError):
+            yacc.yacc(parser="RD", module=json_yacc, cachefile=self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import re
+import unittest
+import dfa
+import lex
+import json_lex, order_lex, states_lex
+from support import dump_tokens, lex_all
+
+
+JSON = '{"a": [1, 2.5, "x\\"y", true, false, null]}\n\t[{}, $, "\\n"]'
+STATES = "abc 12 /* a comment * with stars */ x <@tag @other> 77\n /* unterminated"
+
+
+class DFAEngineTest(unittest.TestCase):
+    def test_same_tokens_as_re(self):
+        for module, text in [(json_lex, JSON), (states_lex, STATES)]:
+            expected = dump_tokens(lex_all(lex.lex(module=module), text))
+            self.assertEqual(dump_tokens(lex_all(lex.lex(module=module, engine="dfa"), text)),
+                             expected)
+
+    def test_longest_match(self):
+        lexer = lex.lex(module=order_lex, engine="dfa")
+        self.assertEqual([(t.type, t.value) for t in lex_all(lexer, "iffy if UPdate 112 7")],
+                         [("name", "iffy"), ("kw", "if"), ("upper", "UPdate"), ("num", "112"),
+                          ("num", "7")])
+
+    def test_fallback_rules(self):
+        lexer = lex.lex(module=order_lex, engine="dfa")
+        stats = lexer.current_rule_set.stats()
+        self.assertEqual(sorted(stats["fallback_rules"]), ["t_repeat", "t_upper"])
+        self.assertEqual(stats["dfa_rules"], 3)
+        self.assertGreater(stats["states"], 0)
+        self.assertEqual(stats["table_size"], stats["states"] * stats["classes"])
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, lex.lex, module=json_lex, engine="nfa")
+
+
+class DFATest(unittest.TestCase):
+    def test_match(self):
+        automaton = dfa.DFA([re.compile(r'if'), re.compile(r'[a-z]+'), re.compile(r'[0-9]+(\.[0-9]+)?')])
+        self.assertEqual(automaton.match("if", 0), (0, 2))
+        self.assertEqual(automaton.match("iffy", 0), (1, 4))
+        self.assertEqual(automaton.match("x 12.5.", 2), (2, 6))
+        self.assertEqual(automaton.match("12.", 0), (2, 2))
+        self.assertEqual(automaton.match("#", 0), (-1, 0))
+
+    def test_scans_to_end(self):
+        automaton = dfa.DFA([re.compile(r'"[^"]*"'), re.compile(r'[0-9]+(\.[0-9]+)?')])
+        self.assertTrue(automaton.scans_to_end('"abc', 0))
+        self.assertFalse(automaton.scans_to_end('"abc" ', 0))
+        self.assertTrue(automaton.scans_to_end("12.", 0))
+        self.assertFalse(automaton.scans_to_end("12.x", 0))
+        self.assertTrue(automaton.scans_to_end("", 0))
+
+    def test_regular(self):
+        for pattern in [r'a|b', r'[^"\\]*', r'x{2,5}', r'(?:ab)+c?', r'\d\s\w', r'.']:
+            self.assertTrue(dfa.is_regular(re.compile(pattern)), pattern)
+        for pattern in [r'(a)\1', r'a(?=b)', r'^a', r'a*?', r'(?i)a']:
+            self.assertFalse(dfa.is_regular(re.compile(pattern)), pattern)
+
+    def test_first_chars(self):
+        self.assertEqual(dfa.first_chars(re.compile(r'[a-c]x|d')), [(97, 100)])
+        self.assertIsNone(dfa.first_chars(re.compile(r'a*')))  # matches ""
+        self.assertIsNone(dfa.first_chars(re.compile(r'(a)\1')))
+
+
+if __name__ == "__main__":
+    unittest.main()
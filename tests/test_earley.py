@@ -0,0 +1,284 @@
+import itertools
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, cyclic, funcs_lex, funcs_yacc, json_lex, json_yacc, letters_lex
+import lr_indirect, nullable_amb, right_rec, sum_amb
+
+
+JSON = '{"a": [1, 2.5, "x", true, null], "b": {}, "c": [[], {"d": {"e": [false]}}]}'
+
+
+def sum_text(n):
+    return " + ".join(str(i % 10) for i in range(n))
+
+
+def recognize(earley, text, lexer):
+    '''Return the finished recognizer of text, to look at its chart.'''
+    recognizer = earley.start()
+    lexer.input(text)
+    for token in lexer.get_token():
+        recognizer.feed(token)
+    recognizer.finish()
+    return recognizer
+
+
+class EarleyChartTest(unittest.TestCase):
+    def check_same_as_rd(self, module, lexer, alphabet, max_length):
+        earley = yacc.yacc(parser="EARLEY", module=module)
+        rd = yacc.yacc(module=module)
+        parsed = 0
+        for n in range(1, max_length + 1):
+            for letters in itertools.product(alphabet, repeat=n):
+                text = " ".join(letters)
+                value = earley.parse(text, lexer)
+                if value is not None:
+                    self.assertEqual(value, rd.parse(text, lexer), text)
+                    parsed += 1
+        self.assertGreater(parsed, 10)
+
+    def test_same_values_as_rd(self):
+        self.check_same_as_rd(calc_left, lex.lex(module=calc_lex), "1+*()", 5)
+        self.check_same_as_rd(lr_indirect, lex.lex(module=letters_lex), "abxyz", 5)
+        earley = yacc.yacc(parser="EARLEY", module=json_yacc)
+        self.assertEqual(earley.parse(JSON, json_lex.lexer),
+                         yacc.yacc(module=json_yacc).parse(JSON, json_lex.lexer))
+
+    def test_syntax_error(self):
+        earley = yacc.yacc(parser="EARLEY", module=calc_left)
+        lexer = lex.lex(module=calc_lex)
+        for text in ["", "1+", "(1", "1)", "1 2"]:
+            self.assertIsNone(earley.parse(text, lexer))
+
+    def test_items_are_deduplicated(self):
+        earley = yacc.yacc(parser="EARLEY", module=sum_amb)
+        n = 30
+        self.assertEqual(earley.parse(sum_text(3), lex.lex(module=letters_lex)), (("0", "1"), "2"))
+        chart = recognize(earley, sum_text(n), lex.lex(module=letters_lex)).chart
+        self.assertEqual(len(chart), 2 * n)
+        for earley_set in chart:
+            keys = [(item.production, item.dot, item.start) for item in earley_set.items]
+            self.assertEqual(len(set(keys)), len(keys))
+            self.assertLessEqual(len(keys), 4 * n)
+
+
+
+class LeoTest(unittest.TestCase):
+    def test_same_values_without_leo(self):
+        lexer = lex.lex(module=letters_lex)
+        for module, text in [(right_rec, "a a a"), (sum_amb, sum_text(6)), (lr_indirect, "a y x")]:
+            with_leo = yacc.yacc(parser="EARLEY", module=module)
+            without_leo = yacc.yacc(parser="EARLEY", module=module, leo=False)
+            self.assertEqual(with_leo.parse(text, lexer), without_leo.parse(text, lexer))
+        text = "[" + ", ".join([JSON] * 50) + "]"
+        self.assertEqual(yacc.yacc(parser="EARLEY", module=json_yacc).parse(text, json_lex.lexer),
+                         yacc.yacc(parser="EARLEY", module=json_yacc,
+                                   leo=False).parse(text, json_lex.lexer))
+
+    def test_right_recursion_is_linear(self):
+        lexer = lex.lex(module=letters_lex)
+        text = " ".join("a" * 200)
+        largest = {}
+        for leo in (True, False):
+            earley = yacc.yacc(parser="EARLEY", module=right_rec, leo=leo)
+            self.assertEqual(earley.parse(text, lexer), ["a"] * 200)
+            chart = recognize(earley, text, lexer).chart
+            largest[leo] = max(len(earley_set.items) for earley_set in chart)
+        self.assertLessEqual(largest[True], 10)
+        self.assertGreater(largest[False], 200)  # the last set completes every LIST
+
+
+
+class ParseForestTest(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=letters_lex)
+
+    def test_all_derivations(self):
+        for leo in (True, False):
+            earley = yacc.yacc(parser="EARLEY", module=sum_amb, leo=leo)
+            counts = []
+            for n in range(1, 7):
+                values = list(earley.parse_all(sum_text(n), self.lexer))
+                self.assertEqual(len(set(values)), len(values))
+                self.assertEqual(values[0], earley.parse(sum_text(n), self.lexer))
+                counts.append(len(values))
+            self.assertEqual(counts, [1, 1, 2, 5, 14, 42])
+            self.assertEqual(sorted(earley.parse_all("1 + 2 + 3", self.lexer)),
+                             [("1", ("2", "3")), (("1", "2"), "3")])
+
+    def test_actions_of_the_returned_derivation_only(self):
+        earley = yacc.yacc(parser="EARLEY", module=sum_amb)
+        calls = []
+        for production in earley.parser.productions:
+            production.yield_rule = lambda p, rule=production.yield_rule: calls.append(1) or rule(p)
+        earley.parse(sum_text(12), self.lexer)
+        self.assertEqual(len(calls), 2 * 12 - 1)
+
+    def test_cyclic_derivations_are_left_out(self):
+        for leo in (True, False):
+            earley = yacc.yacc(parser="EARLEY", module=cyclic, leo=leo)
+            self.assertEqual(earley.parse("a", self.lexer), ("A", "a"))
+            self.assertEqual(sorted(earley.parse_all("a", self.lexer)),
+                             [("A", "a"), ("A", ("A", "a")), ("A", ("A", ("B", ("A", "a")))),
+                              ("A", ("B", ("A", "a"))), ("A", ("B", ("A", ("A", "a"))))])
+
+    def test_no_derivation(self):
+        earley = yacc.yacc(parser="EARLEY", module=sum_amb)
+        self.assertEqual(list(earley.parse_all("1 +", self.lexer)), [])
+
+    def test_parse_all_is_earley_only(self):
+        with self.assertRaises(ValueError):
+            yacc.yacc(module=sum_amb).parse_all("1", self.lexer)
+
+
+
+class NullableTest(unittest.TestCase):
+    def test_empty_arguments(self):
+        lexer = lex.lex(module=funcs_lex)
+        rd = yacc.yacc(module=funcs_yacc)
+        for leo in (True, False):
+            earley = yacc.yacc(parser="EARLEY", module=funcs_yacc, leo=leo)
+            for text in ["f() = a", "g(x) = x + y", "h(x, y, z) = x + z"]:
+                self.assertEqual(earley.parse(text, lexer), rd.parse(text, lexer))
+            self.assertEqual(earley.parse("f() = a", lexer),
+                             ("function", "f", ("args", []), ("sum", ["a"])))
+            self.assertIsNone(earley.parse("f(x,) = a", lexer))
+
+    def test_derivations_of_the_empty_string(self):
+        lexer = lex.lex(module=letters_lex)
+        for leo in (True, False):
+            earley = yacc.yacc(parser="EARLEY", module=nullable_amb, leo=leo)
+            values = list(earley.parse_all("", lexer))
+            self.assertEqual(values[0], ("S", ("A",), ("B",), ("C",)))
+            self.assertEqual(sorted(values),
+                             sorted(("S", ("A",), b, c)
+                                    for b in [("B",), ("B", ("A",), ("A",))]
+                                    for c in [("C",), ("C", ("B",)),
+                                              ("C", ("B", ("A",), ("A",)))]))
+
+    def test_same_derivations_without_leo(self):
+        lexer = lex.lex(module=letters_lex)
+        with_leo = yacc.yacc(parser="EARLEY", module=nullable_amb)
+        without_leo = yacc.yacc(parser="EARLEY", module=nullable_amb, leo=False)
+        for n in range(4):
+            for letters in itertools.product("a+1", repeat=n):
+                text = " ".join(letters)
+                values = list(with_leo.parse_all(text, lexer))
+                self.assertEqual(len(set(values)), len(values), text)
+                self.assertEqual(sorted(values), sorted(without_leo.parse_all(text, lexer)), text)
+
+
+
+class PredictionClosureTest(unittest.TestCase):
+    def test_closure(self):
+        parser = yacc.yacc(parser="EARLEY", module=json_yacc).parser
+        ids = parser.symbol_ids
+        mask, productions = parser.closures[ids["VALUE"]]
+        self.assertEqual(mask, sum(1 << ids[name] for name in ["VALUE", "OBJECT", "ARRAY"]))
+        self.assertEqual(sorted(set(parser.productions[n].head for n in productions)),
+                         ["ARRAY", "OBJECT", "VALUE"])
+        self.assertEqual(len(productions), 10)
+        self.assertIsNone(parser.closures[ids["comma"]])
+
+    def test_only_items_that_can_read_the_token(self):
+        earley = yacc.yacc(parser="EARLEY", module=json_yacc)
+        first_set = recognize(earley, "[1]", json_lex.lexer).chart[0].items
+        self.assertEqual(sorted(str(earley.parser.productions[item.production])
+                                for item in first_set),
+                         ["ARRAY : lbracket ELEMENTS rbracket", "ARRAY : lbracket rbracket",
+                          "VALUE : ARRAY"])
+
+    def test_same_derivations_as_unfiltered_predictions(self):
+        lexer = lex.lex(module=letters_lex)
+        for module, alphabet in [(sum_amb, "1+"), (nullable_amb, "a+1")]:
+            filtered = yacc.yacc(parser="EARLEY", module=module)
+            unfiltered = yacc.yacc(parser="EARLEY", module=module)
+            unfiltered.parser.starts = [(first, True) for first, _ in unfiltered.parser.starts]
+            for n in range(5):
+                for letters in itertools.product(alphabet, repeat=n):
+                    text = " ".join(letters)
+                    self.assertEqual(sorted(filtered.parse_all(text, lexer)),
+                                     sorted(unfiltered.parse_all(text, lexer)), text)
+
+
+
+class FeedTest(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=calc_lex)
+        self.parser = yacc.yacc(parser="EARLEY", module=calc_left)
+
+    def tokens(self, text):
+        self.lexer.input(text)
+        return list(self.lexer.get_token())
+
+    def test_same_value_as_parse(self):
+        for text in ["1", "1+2*3", "(1+2)*3"]:
+            parser = self.parser.start()
+            for token in self.tokens(text):
+                self.assertTrue(parser.feed(token))
+                self.assertTrue(parser.is_viable())
+            self.assertEqual(parser.finish(), self.parser.parse(text, self.lexer))
+
+    def test_expected_tokens(self):
+        parser = self.parser.start()
+        self.assertEqual(parser.expected_tokens(), set(["num", "lp"]))
+        tokens = self.tokens("(1+2")
+        parser.feed(tokens[0])
+        parser.feed(tokens[1])
+        self.assertEqual(parser.expected_tokens(), set(["plus", "times", "rp"]))
+        parser.feed(tokens[2])
+        parser.feed(tokens[3])
+        self.assertEqual(parser.expected_tokens(), set(["plus", "times", "rp"]))
+        parser = self.parser.start()
+        parser.feed(self.tokens("1")[0])
+        self.assertEqual(parser.expected_tokens(), set(["plus", "times", yacc.END]))
+
+    def test_rejected_token(self):
+        parser = self.parser.start()
+        tokens = self.tokens("1+)2")
+        self.assertTrue(parser.feed(tokens[0]))
+        self.assertTrue(parser.feed(tokens[1]))
+        self.assertFalse(parser.feed(tokens[2]))
+        self.assertFalse(parser.is_viable())
+        self.assertEqual(parser.expected_tokens(), set(["num", "lp"]))
+        self.assertFalse(parser.feed(tokens[3]))  # ignored
+        self.assertIsNone(parser.finish())
+
+    def test_feed_after_finish(self):
+        parser = self.parser.start()
+        parser.feed(self.tokens("1")[0])
+        self.assertEqual(parser.finish(), 1)
+        self.assertEqual(parser.finish(), 1)
+        with self.assertRaises(ValueError):
+            parser.feed(self.tokens("2")[0])
+
+    def test_independent_parses(self):
+        first, second = self.parser.start(), self.parser.start()
+        tokens, other = self.tokens("1+2"), self.tokens("(3)*4")
+        for i in range(max(len(tokens), len(other))):
+            if i < len(tokens):
+                self.assertTrue(first.feed(tokens[i]))
+            if i < len(other):
+                self.assertTrue(second.feed(other[i]))
+        self.assertEqual(second.finish(), ("*", 3, 4))
+        self.assertEqual(first.finish(), ("+", 1, 2))
+
+    def test_parse_while_feeding(self):
+        parser = self.parser.start()
+        tokens = self.tokens("1+2*3")
+        parser.feed(tokens[0])
+        parser.feed(tokens[1])
+        self.assertIsNone(self.parser.parse("1 2", self.lexer))
+        self.assertEqual(list(self.parser.parse_all("4", self.lexer)), [4])
+        self.assertEqual(parser.expected_tokens(), set(["num", "lp"]))
+        for token in tokens[2:]:
+            self.assertTrue(parser.feed(token))
+        self.assertEqual(parser.finish(), ("+", 1, ("*", 2, 3)))
+
+    def test_start_is_earley_only(self):
+        with self.assertRaises(ValueError):
+            yacc.yacc(module=calc_left).start()
+
+
+if __name__ == "__main__":
+    unittest.main()
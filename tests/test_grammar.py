@@ -0,0 +1,41 @@
+import types
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left
+from support import lex_all
+
+
+def calc_words_lexer():
+    '''The lexer of calc_lex with a token the grammars don't know.'''
+    module = types.ModuleType("calc_words_lex")
+    for name, value in vars(calc_lex).items():
+        if name.startswith("t_"):
+            setattr(module, name, value)
+    module.tokens = ("word",) + calc_lex.tokens  # other ids than the grammar's
+    module.t_word = r'[a-z]+'
+    return lex.lex(module=module)
+
+
+class SymbolIdsTest(unittest.TestCase):
+    def test_symbols_are_interned(self):
+        grammar = yacc.yacc(module=calc_left).parser
+        self.assertEqual([grammar.symbol_ids[name] for name in grammar.symbol_names],
+                         range(len(grammar.symbol_names)))
+        self.assertEqual(grammar.symbol_names[grammar.start_id], "EXP")
+
+    def test_token_ids_of_another_lexer(self):
+        lexer = calc_words_lexer()
+        parsers = [yacc.yacc(parser=name, module=calc_left) for name in ("RD", "LALR", "EARLEY")]
+        for parser in parsers:
+            self.assertEqual(parser.parse("1 + 2*3", lexer), ("+", 1, ("*", 2, 3)))
+        tokens = parser.parser.token_types(lex_all(lexer, "1 + x"))
+        self.assertEqual(tokens[2], yacc.NO_SYMBOL)
+        self.assertIsInstance(parsers[0].parse("x + 1", lexer), yacc.ParseError)
+        error = parsers[1].parse("1 + x", lexer)
+        self.assertEqual((str(error), error.errorPos()), ("set(['word'])(1, 5)", (1, 5)))
+        self.assertIsNone(parsers[2].parse("1 + x", lexer))
+
+
+if __name__ == "__main__":
+    unittest.main()
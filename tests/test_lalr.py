@@ -0,0 +1,46 @@
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, calc_amb, json_lex, json_yacc
+
+
+JSON = '{"a": [1, 2.5, "x", true, false, null], "b": {}, "c": [[], {"d": "e"}]}'
+
+
+class LALRParserTest(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=calc_lex)
+
+    def test_same_values_as_rd(self):
+        lalr = yacc.yacc(parser="LALR", module=calc_left)
+        rd = yacc.yacc(parser="RD", module=calc_left)
+        self.assertEqual(lalr.parser.conflicts, [])
+        for text in ["1", "1+2+3", "1*2+3*4", "(1+2)*3", "((1))*(2+3)*4"]:
+            self.assertEqual(lalr.parse(text, self.lexer), rd.parse(text, self.lexer))
+
+    def test_json(self):
+        lalr = yacc.yacc(parser="LALR", module=json_yacc)
+        rd = yacc.yacc(parser="RD", module=json_yacc)
+        self.assertEqual(lalr.parser.conflicts, [])
+        for text in [JSON, "[]", "{}", '"s"', "[[[1]]]"]:
+            self.assertEqual(lalr.parse(text, json_lex.lexer), rd.parse(text, json_lex.lexer))
+
+    def test_syntax_error(self):
+        lalr = yacc.yacc(parser="LALR", module=calc_left)
+        for text, token, position in [("", "$end", (1, 1)), ("1+", "$end", (1, 3)),
+                                      ("(1", "$end", (1, 3)), ("1)", "rp", (1, 2)),
+                                      ("1 2", "num", (1, 3)), ("1+\n*2", "times", (2, 1))]:
+            error = lalr.parse(text, self.lexer)
+            self.assertIsInstance(error, yacc.ParseError)
+            self.assertEqual(str(error), "%s%s" % (set([token]), position), text)
+
+    def test_conflicts_are_resolved_by_shifting(self):
+        lalr = yacc.yacc(parser="LALR", module=calc_amb)
+        self.assertEqual(len(lalr.parser.conflicts), 4)
+        self.assertTrue(all(c.startswith("shift/reduce") for c in lalr.parser.conflicts))
+        self.assertEqual(lalr.parse("1+2+3", self.lexer), ("+", 1, ("+", 2, 3)))
+        self.assertEqual(lalr.parse("1*2+3", self.lexer), ("*", 1, ("+", 2, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+import unittest
+import types
+import lex
+import yacc
+import calc_lex, calc_left, json_lex, order_lex, states_lex, words_lex
+from support import dump_tokens, lex_all
+
+
+def lex_types(lexer, text):
+    lexer.input(text)
+    return [(t.type, t.value) for t in lexer.get_token()]
+
+
+class MasterRegexTest(unittest.TestCase):
+    def test_first_rule_in_order_wins(self):
+        lexer = lex.lex(module=order_lex)
+        self.assertEqual(lex_types(lexer, "if else iffy x"),
+                         [("kw", "if"), ("kw", "else"), ("kw", "if"), ("name", "fy"),
+                          ("name", "x")])
+
+    def test_rules_outside_the_master_regexp_keep_their_order(self):
+        lexer = lex.lex(module=order_lex)
+        self.assertEqual(lex_types(lexer, "UPdate upper down 111 12 221"),
+                         [("upper", "UPdate"), ("upper", "upper"), ("name", "down"),
+                          ("repeat", "111"), ("num", "12"), ("repeat", "22"), ("num", "1")])
+
+    def test_more_rules_than_groups_of_a_regexp(self):
+        module = types.ModuleType("many_lex")
+        module.tokens = tuple("w%d" % i for i in range(150))
+        for name in module.tokens:
+            setattr(module, "t_" + name, name + "x")
+        module.t_ignore = " "
+        module.t_error = order_lex.t_error
+        lexer = lex.lex(module=module)
+        self.assertEqual([t.type for t in lex_all(lexer, "w0x w149x w77x w7x")],
+                         ["w0", "w149", "w77", "w7"])
+
+    def test_rule_sets_are_built_once_per_state_combination(self):
+        lexer = lex.lex(module=states_lex)
+        text = "a <@b> /* c */ d <@e> /* f */"
+        first = [(t.type, t.value) for t in lex_all(lexer, text)]
+        rule_sets = dict(lexer._rule_sets)
+        self.assertEqual(len(rule_sets), 3)  # INITIAL, INITIAL + TAGS, COMMENTS
+        self.assertEqual([(t.type, t.value) for t in lex_all(lexer, text)], first)
+        self.assertEqual(lexer._rule_sets, rule_sets)
+        self.assertEqual(first, [("WORD", "a"), ("TAG", "@b"), ("COMMENT", "c "), ("WORD", "d"),
+                                 ("TAG", "@e"), ("COMMENT", "f ")])
+
+
+
+class InPlaceMatchingTest(unittest.TestCase):
+    def test_tokens_are_slices_at_their_offsets(self):
+        lexer = lex.lex(module=order_lex)
+        lexer.input("  if 42 zz")
+        self.assertEqual([(t.value, t.lexpos) for t in lexer.get_token()],
+                         [("if", 2), ("42", 5), ("zz", 8)])
+
+    def test_error_value_is_a_view_of_the_rest_of_the_input(self):
+        seen = []
+        def t_error(t):
+            seen.append(t.value)
+            t.lexer.skip(1)
+        module = types.ModuleType("view_lex")
+        module.tokens, module.t_word, module.t_error = ("word",), r'[a-z]+', t_error
+        module.t_ignore = " "
+        lexer = lex.lex(module=module)
+        lexer.input("ab#cd!")
+        self.assertEqual([t.value for t in lexer.get_token()], ["ab", "cd"])
+        view = seen[0]
+        self.assertIsInstance(view, lex.LexDataView)
+        self.assertEqual(str(view), "#cd!")
+        self.assertEqual((len(view), view[0], view[-1], view[1:3]), (4, "#", "!", "cd"))
+        self.assertEqual(list(view), list("#cd!"))
+        self.assertTrue(view.startswith("#c"))
+        self.assertEqual(view, "#cd!")
+        self.assertEqual(str(seen[1]), "!")
+
+    def test_view_has_the_methods_of_strings(self):
+        view = lex.LexDataView("ab#cd!", 2)
+        self.assertEqual((view.find("d"), view.upper(), view.split("c")), (2, "#CD!", ["#", "d!"]))
+        self.assertTrue(view.startswith(("x", "#c")))
+        self.assertEqual(hash(view), hash("#cd!"))
+        self.assertEqual(view, lex.LexDataView("#cd!", 0))
+
+    def test_unicode_view(self):
+        view = lex.LexDataView(u"ab\xe9!", 2)
+        self.assertEqual(view, u"\xe9!")
+        self.assertEqual(repr(view), repr(u"\xe9!"))
+        self.assertEqual(unicode(view), u"\xe9!")
+        self.assertEqual(str(view), u"\xe9!".encode("utf-8"))
+        lexer = lex.lex(module=calc_lex)
+        error = lex_all(lexer, u"1+\xe9").errors[0]
+        self.assertEqual(str(error), "LexError('unknown char', u'\\xe9', 1, 3)")
+        with self.assertRaisesRegexp(ValueError, "unknown char"):
+            yacc.yacc(module=calc_left).parse(u"1+\xe9", lexer)
+
+
+
+def char_by_char_position(text, offset):
+    lineno, col = 1, 1
+    for ch in text[:offset]:
+        if ch == "\n":
+            lineno, col = lineno + 1, 1
+        elif ch == "\t":
+            col += lex.TAB_SIZE - (col - 1) % lex.TAB_SIZE
+        else:
+            col += 1
+    return lineno, col
+
+
+class PositionTest(unittest.TestCase):
+    TEXT = 'ab\t12 "multi\nline\tstring"\tx\n\n  \t y\t\t"s" $\n\tz ?'
+
+    def test_positions_of_tokens_and_errors(self):
+        lexer = lex.lex(module=words_lex)
+        tokens = lex_all(lexer, self.TEXT)
+        self.assertEqual((len(tokens), len(tokens.errors)), (7, 2))
+        for item in list(tokens) + tokens.errors:
+            self.assertEqual((item.lineno, item.pos), char_by_char_position(self.TEXT, item.lexpos))
+        self.assertEqual((lexer.lineno, lexer.lexcol), char_by_char_position(self.TEXT, len(self.TEXT)))
+
+    def test_advance_position(self):
+        for text in ["", "abc", "\t", "a\tb", "x\n\ty\t", "\n\n", "ab\ncd\t\te"]:
+            for col in (1, 3, 8, 9):
+                lineno, pos = char_by_char_position(" " * (col - 1) + text, col - 1 + len(text))
+                self.assertEqual(lex.advance_position(1, col, text), (lineno, pos))
+
+    def test_lazy_positions(self):
+        eager = lex_all(lex.lex(module=words_lex), self.TEXT)
+        lexer = lex.lex(module=words_lex, lazy_positions=True)
+        lazy = lex_all(lexer, self.TEXT)
+        self.assertEqual([(t.lineno, t.pos) for t in lazy], [(t.lineno, t.pos) for t in eager])
+        self.assertEqual([(e.lineno, e.pos) for e in lazy.errors],
+                         [(e.lineno, e.pos) for e in eager.errors])
+        for offset in range(len(self.TEXT) + 1):
+            self.assertEqual(lexer.position(offset), char_by_char_position(self.TEXT, offset))
+
+    def test_lazy_positions_after_another_input(self):
+        lexer = lex.lex(module=words_lex, lazy_positions=True)
+        lexer.input(self.TEXT)
+        streamed = list(lexer.get_token())
+        tokens = lexer.tokenize()
+        lex_all(lexer, "\n\n\t\t" * 10 + self.TEXT[::-1])
+        for item in streamed + list(tokens) + tokens.errors:
+            self.assertEqual((item.lineno, item.pos), char_by_char_position(self.TEXT, item.lexpos))
+        error = yacc.yacc(module=calc_left).parse("(1+\n2", lex.lex(module=calc_lex,
+                                                                    lazy_positions=True))
+        self.assertEqual(error.errorPos(), (2, 2))
+
+
+
+class TokenBufferTest(unittest.TestCase):
+    TEXT = 'abc 12 "s" ? de 3'
+
+    def test_buffer_holds_the_tokens_of_get_token(self):
+        lexer = lex.lex(module=words_lex)
+        lexer.input(self.TEXT)
+        streamed = [(t.type, t.value, t.lexpos, t.lineno, t.pos)
+                    for t in lexer.get_token() if not t.is_error]
+        tokens = lex_all(lexer, self.TEXT)
+        self.assertEqual(len(tokens), 5)
+        self.assertEqual([(t.type, t.value, t.lexpos, t.lineno, t.pos) for t in tokens], streamed)
+        self.assertEqual([tokens.type(i) for i in range(len(tokens))],
+                         ["word", "num", "string", "word", "num"])
+        self.assertEqual(list(tokens.types), [words_lex.tokens.index(tokens.type(i))
+                                              for i in range(len(tokens))])
+        self.assertEqual([e.lexpos for e in tokens.errors], [11])
+        self.assertRaises(IndexError, tokens.__getitem__, len(tokens))
+
+    def test_only_values_changed_by_rules_are_stored(self):
+        tokens = lex_all(lex.lex(module=words_lex), self.TEXT)
+        self.assertEqual(sorted(tokens.values.items()), [(1, 12), (4, 3)])
+        self.assertEqual(tokens.value(0), "abc")
+        self.assertEqual(tokens.value(2), '"s"')
+
+    def test_tokens_have_slots(self):
+        token = lex_all(lex.lex(module=words_lex), self.TEXT)[0]
+        self.assertFalse(hasattr(token, "__dict__"))
+        error = lex_all(lex.lex(module=words_lex), self.TEXT).errors[0]
+        self.assertFalse(hasattr(error, "__dict__"))
+
+
+
+class TokenIdsTest(unittest.TestCase):
+    def test_type_ids(self):
+        lexer = lex.lex(module=json_lex)
+        self.assertEqual(lexer.token_ids, {name: i for i, name in enumerate(json_lex.tokens)})
+        lexer.input('[1, "a"]')
+        for token in lexer.get_token():
+            self.assertEqual(token.type_id, lexer.token_ids[token.type])
+
+    def test_unknown_token_name_set_by_a_rule(self):
+        def t_word(t):
+            r'[a-z]+'
+            t.type = "missing"
+            return t
+        module = types.ModuleType("bad_lex")
+        module.tokens, module.t_word, module.t_ignore = ("word",), t_word, " "
+        module.t_error = order_lex.t_error
+        lexer = lex.lex(module=module)
+        lexer.input("abc")
+        with self.assertRaisesRegexp(ValueError, "unknown token name missing"):
+            list(lexer.get_token())
+
+
+class DispatchTest(unittest.TestCase):
+    def test_candidate_rules_of_a_char(self):
+        rule_set = lex.lex(module=order_lex).current_rule_set
+        self.assertEqual(rule_set.first_chars,
+                         [[(101, 101), (105, 105)], None, None, [(48, 57)], [(65, 90), (97, 122)]])
+        candidates = lambda ch: [rule.__name__ for _, rules in rule_set._get_segments_for(ch)
+                                 for rule in rules.values()]
+        # t_upper and t_repeat aren't regular: they are tried for every char
+        self.assertEqual(candidates("i"), ["t_kw", "t_upper", "t_repeat", "t_name"])
+        self.assertEqual(candidates("7"), ["t_upper", "t_repeat", "t_num"])
+        self.assertEqual(candidates("U"), ["t_upper", "t_repeat", "t_name"])
+        self.assertEqual(candidates("#"), ["t_upper", "t_repeat"])
+
+    def test_dispatch_gives_the_same_tokens(self):
+        text = "if UPs 1 22 x # else"
+        lexer = lex.lex(module=order_lex)
+        rule_set = lexer.current_rule_set
+        rule_set.first_chars = [None] * len(rule_set.rules)
+        undispatched = dump_tokens(lex_all(lexer, text))
+        self.assertEqual(dump_tokens(lex_all(lex.lex(module=order_lex), text)), undispatched)
+        self.assertEqual([t[0] for t in undispatched[0]],
+                         ["kw", "upper", "num", "repeat", "name", "kw"])
+        self.assertEqual([e[0] for e in undispatched[1]], [14])
+
+    def test_ignored_runs_are_skipped_at_once(self):
+        module = types.ModuleType("ignore_lex")
+        module.tokens, module.t_word, module.t_error = ("word",), r'[a-z]+', order_lex.t_error
+        module.t_ignore = " \t-]^\\"
+        lexer = lex.lex(module=module)
+        calls = []
+        ignored = lexer._ignored
+        lexer._ignored = lambda: calls.append(1) or ignored()
+        text = "a" + " \t-]^\\" * 1000 + "b \t\nc"
+        tokens = lex_all(lexer, text)
+        self.assertEqual([(t.value, t.lexpos) for t in tokens], [("a", 0), ("b", 6001), ("c", 6005)])
+        self.assertEqual([e.value for e in tokens.errors], ["\n"])
+        self.assertLess(len(calls), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
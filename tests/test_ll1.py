@@ -0,0 +1,36 @@
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, calc_ll1, json_yacc
+
+
+class LL1ParserTest(unittest.TestCase):
+    def setUp(self):
+        self.lexer = lex.lex(module=calc_lex)
+
+    def test_same_values_as_rd(self):
+        ll1 = yacc.yacc(parser="LL1", module=calc_ll1)
+        rd = yacc.yacc(parser="RD", module=calc_left)
+        for text in ["1", "1+2+3", "1*2+3*4", "(1+2)*3", "((1))*(2+3)*4"]:
+            self.assertEqual(ll1.parse(text, self.lexer), rd.parse(text, self.lexer))
+
+    def test_syntax_error(self):
+        ll1 = yacc.yacc(parser="LL1", module=calc_ll1)
+        for text, token, position in [("", "$end", (1, 1)), ("1+", "$end", (1, 3)),
+                                      ("(1", "$end", (1, 3)), ("1)", "rp", (1, 2)),
+                                      ("1 2", "num", (1, 3)), ("1+\n*2", "times", (2, 1))]:
+            error = ll1.parse(text, self.lexer)
+            self.assertIsInstance(error, yacc.ParseError)
+            self.assertEqual(str(error), "%s%s" % (set([token]), position), text)
+
+    def test_left_recursion_is_refused(self):
+        with self.assertRaisesRegexp(SyntaxError, "EXP is left-recursive"):
+            yacc.yacc(parser="LL1", module=calc_left)
+
+    def test_conflict_is_refused(self):
+        with self.assertRaisesRegexp(SyntaxError, "conflict of OBJECT on 'lbrace'"):
+            yacc.yacc(parser="LL1", module=json_yacc)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, calc_ll1, json_lex, json_yacc, words_lex
+from support import dump_tokens, lex_all
+
+
+WORDS = "\n".join('abc 12 "multi\nline" $ def\t%d ? "x"' % i for i in range(200)) + " # tail"
+JSON = "[\n" + ",\n".join('{"k%d": [%d, "a\nb", true, null]} %s' % (i, i, "$" * (i % 3))
+                         for i in range(200)) + "\n]"
+
+
+class TokenizeParallelTest(unittest.TestCase):
+    def check_same_as_serial(self, module, text, lazy_positions=False):
+        lexer = lex.lex(module=module, lazy_positions=lazy_positions)
+        expected = dump_tokens(lex_all(lexer, text))
+        for chunk_size in [1, 7, 100, 1000, len(text)]:
+            tokens = lexer.tokenize_parallel(text, workers=3, chunk_size=chunk_size)
+            self.assertEqual(dump_tokens(tokens), expected, chunk_size)
+
+    def test_json(self):
+        self.check_same_as_serial(json_lex, JSON)
+
+    def test_lazy_positions(self):
+        self.check_same_as_serial(json_lex, JSON, lazy_positions=True)
+
+    def test_error_values_are_views_of_the_input(self):
+        self.check_same_as_serial(words_lex, WORDS)
+        lexer = lex.lex(module=words_lex)
+        tokens = lexer.tokenize_parallel(WORDS, workers=2, chunk_size=50)
+        self.assertEqual(str(tokens.errors[-1].value), "# tail")
+        self.assertIsInstance(tokens.errors[0].value, lex.LexDataView)
+
+
+class BatchTest(unittest.TestCase):
+    def test_tokenize_many(self):
+        texts = [WORDS[:n] for n in range(0, len(WORDS), 97)]
+        lexer = lex.lex(module=words_lex)
+        expected = [dump_tokens(lex_all(lexer, text)) for text in texts]
+        for ordered in (True, False):
+            results = list(lexer.tokenize_many(texts, workers=3, ordered=ordered))
+            self.assertEqual(sorted(res.index for res in results), range(len(texts)))
+            for index, tokens, error in results:
+                self.assertIsNone(error)
+                self.assertEqual(dump_tokens(tokens), expected[index])
+
+    def test_parse_many(self):
+        texts = ['[1, "a"]', '{"k": [true, null]}', '[1,', '{}']
+        for name in ["RD", "LALR", "EARLEY"]:
+            parser = yacc.yacc(parser=name, module=json_yacc)
+            results = list(parser.parse_many(texts, json_lex.lexer, workers=2))
+            self.assertEqual([res.index for res in results], range(len(texts)))
+            for index, tree, error in results:
+                if index == 2:
+                    self.assertIsNone(tree)
+                    self.assertIsNotNone(error, name)
+                else:
+                    self.assertIsNone(error)
+                    self.assertEqual(tree, parser.parse(texts[index], json_lex.lexer))
+
+    def test_syntax_errors_of_all_parsers(self):
+        lexer = lex.lex(module=calc_lex)
+        for name, module in [("RD", calc_left), ("LALR", calc_left), ("EARLEY", calc_left),
+                             ("LL1", calc_ll1)]:
+            parser = yacc.yacc(parser=name, module=module)
+            results = list(parser.parse_many(["1+2", "(1"], lexer, workers=1))
+            self.assertEqual([(res.result, res.error is None) for res in results],
+                             [(("+", 1, 2), True), (None, False)], name)
+
+    def test_parse_many_in_process(self):
+        parser = yacc.yacc(module=json_yacc)
+        results = list(parser.parse_many(['[1]', '[2]'], json_lex.lexer, workers=1))
+        self.assertEqual([res.result for res in results], [("elements", 1), ("elements", 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
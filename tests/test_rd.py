@@ -0,0 +1,184 @@
+import itertools
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, choice_yacc, json_lex, json_yacc, letters_lex
+import lr_append, lr_indirect, lr_nullable
+
+
+JSON = '{"a": [1, 2.5, "x", true, null], "b": {}, "c": [[], {"d": {"e": [false]}}]}'
+
+
+def flatten(tree):
+    '''Return the nodes of a tree in preorder, with the nesting as markers:
+    deep trees can't be compared directly within the recursion limit.'''
+    res, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (tuple, list)):
+            res.append(type(node).__name__)
+            stack.append(")")
+            stack.extend(reversed(node))
+        else:
+            res.append(node)
+    return res
+
+
+def parse_result(parser, text, lexer):
+    res = parser.parse(text, lexer)
+    return str(res) if isinstance(res, yacc.ParseError) else res
+
+
+class PredictionTest(unittest.TestCase):
+    def test_alternatives_of_a_token(self):
+        parser = yacc.yacc(module=choice_yacc).parser
+        rest = parser.predictions[parser.symbol_ids["REST"]]
+        bodies = lambda token: [production.body
+                                for production in rest.get(token, rest[yacc.END_ID])]
+        self.assertEqual(bodies(parser.symbol_ids["x"]),
+                         [("x", "REST"), ("x", "y"), (yacc.EPSILON,)])
+        self.assertEqual(bodies(parser.symbol_ids["y"]), [(yacc.EPSILON,)])
+        self.assertEqual(bodies(yacc.END_ID), [(yacc.EPSILON,)])
+        s = parser.predictions[parser.symbol_ids["S"]]
+        self.assertEqual(len(s[parser.symbol_ids["a"]]), 1)
+        self.assertEqual(len(s[parser.symbol_ids["b"]]), 2)
+        self.assertNotIn(parser.symbol_ids["x"], s)
+
+    def test_same_results_as_trying_all_alternatives(self):
+        lexer = lex.lex(module=letters_lex)
+        pruned = yacc.yacc(module=choice_yacc)
+        unpruned = yacc.yacc(module=choice_yacc)
+        unpruned.parser.predictions = [{yacc.END_ID: tuple(productions)}
+                                       for productions in unpruned.parser.alternatives]
+        for n in range(6):
+            for letters in itertools.product("abxy", repeat=n):
+                text = " ".join(letters)
+                self.assertEqual(parse_result(pruned, text, lexer),
+                                 parse_result(unpruned, text, lexer), text)
+
+    def test_ordered_choice(self):
+        lexer = lex.lex(module=letters_lex)
+        parser = yacc.yacc(module=choice_yacc)
+        self.assertEqual(parser.parse("b b", lexer), ("S", "b", "b"))
+        self.assertEqual(parser.parse("a x y", lexer),
+                         ("S", ("OPT", []), "a", ("REST", "x", ("REST", []))))
+
+    def test_error_at_the_end_of_input(self):
+        parser = yacc.yacc(module=calc_left)
+        error = parser.parse("(1", lex.lex(module=calc_lex))
+        self.assertIsInstance(error, yacc.ParseError)
+        self.assertIn("$end", str(error))
+
+
+
+class MemoTest(unittest.TestCase):
+    def check_same_results(self, choice_options, json_options):
+        lexer = lex.lex(module=letters_lex)
+        expected = yacc.yacc(module=choice_yacc)
+        parser = yacc.yacc(module=choice_yacc, **choice_options)
+        for n in range(6):
+            for letters in itertools.product("abxy", repeat=n):
+                text = " ".join(letters)
+                self.assertEqual(parse_result(parser, text, lexer),
+                                 parse_result(expected, text, lexer), text)
+        expected = yacc.yacc(module=json_yacc).parse(JSON, json_lex.lexer)
+        parser = yacc.yacc(module=json_yacc, **json_options)
+        self.assertEqual(parser.parse(JSON, json_lex.lexer), expected)
+
+    def test_memo_limit(self):
+        for limit in [0, 1, 5, 50]:
+            self.check_same_results({"memo_limit": limit}, {"memo_limit": limit})
+
+    def test_memoize(self):
+        self.check_same_results({"memoize": []}, {"memoize": []})
+        self.check_same_results({"memoize": ["REST"]}, {"memoize": ["VALUE", "ELEMENTS"]})
+        self.check_same_results({"memoize": ["S", "OPT"], "memo_limit": 3},
+                                {"memoize": ["PAIR"], "memo_limit": 3})
+        self.assertEqual(yacc.yacc(module=json_yacc, memoize=["PAIR"]).parser.num_memo_slots, 1)
+
+    def test_unknown_nonterminal_to_memoize(self):
+        with self.assertRaisesRegexp(ValueError, "FOO, num"):
+            yacc.yacc(module=calc_left, memoize=["EXP", "num", "FOO"])
+
+    def test_dict_memo_is_capped(self):
+        memo = yacc.PackratMemo(2, 10, 5)
+        self.assertFalse(memo.dense)
+        for i in range(10):
+            memo.put(i % 2, i, ("tree", i + 1), i)
+        self.assertEqual(len(memo.table), 5)
+        self.assertEqual(memo.get(0, 4), ("tree", 5))
+        self.assertIsNone(memo.get(1, 9))
+
+    def test_no_state_between_parses(self):
+        parser = yacc.yacc(module=calc_left)
+        lexer = lex.lex(module=calc_lex)
+        self.assertEqual(parser.parse("1+2", lexer), ("+", 1, 2))
+        self.assertIsNone(parser.parser.memo)
+        with self.assertRaises(ValueError):  # a lex error
+            parser.parse("1+$", lexer)
+        self.assertIsNone(parser.parser.memo)
+        self.assertEqual(parser.parse("3*4", lexer), ("*", 3, 4))
+
+
+
+class DeepInputTest(unittest.TestCase):
+    def check_same_as_lalr(self, module, lexer, text):
+        rd = yacc.yacc(module=module).parse(text, lexer)
+        lalr = yacc.yacc(parser="LALR", module=module).parse(text, lexer)
+        self.assertNotIsInstance(rd, yacc.ParseError)
+        self.assertEqual(flatten(rd), flatten(lalr))
+
+    def test_long_json_array(self):
+        text = "[" + ", ".join('{"k": %d}' % i for i in range(5000)) + "]"
+        self.check_same_as_lalr(json_yacc, json_lex.lexer, text)
+
+    def test_deep_json_nesting(self):
+        text = '[{"a": ' * 3000 + "1" + "}]" * 3000
+        self.check_same_as_lalr(json_yacc, json_lex.lexer, text)
+
+    def test_deep_left_recursive_nesting(self):
+        lexer = lex.lex(module=calc_lex)
+        self.check_same_as_lalr(calc_left, lexer, "(" * 3000 + "1" + "+2)" * 3000)
+        self.check_same_as_lalr(calc_left, lexer, "+".join(["1*2"] * 3000))
+
+
+
+class LeftRecursionTest(unittest.TestCase):
+    def check_same_as_earley(self, module, alphabet, max_length):
+        lexer = lex.lex(module=letters_lex)
+        rd = yacc.yacc(module=module)
+        earley = yacc.yacc(parser="EARLEY", module=module)
+        parsed = 0
+        for n in range(1, max_length + 1):
+            for letters in itertools.product(alphabet, repeat=n):
+                text = " ".join(letters)
+                expected = earley.parse(text, lexer)
+                if expected is not None:
+                    self.assertEqual(rd.parse(text, lexer), expected, text)
+                    parsed += 1
+        self.assertGreater(parsed, 10)
+
+    def test_direct(self):
+        self.check_same_as_earley(calc_left, "1+*()", 6)
+        parser = yacc.yacc(module=calc_left)
+        self.assertEqual(parser.parser.lr_heads,
+                         set(parser.parser.symbol_ids[name] for name in ["EXP", "TERM"]))
+
+    def test_indirect(self):
+        self.check_same_as_earley(lr_indirect, "abxyz", 6)
+        parser = yacc.yacc(module=lr_indirect)
+        self.assertEqual(parser.parse("b z x y x", lex.lex(module=letters_lex)),
+                         ("A", ("B", ("A", ("B", ("B", "b"), "z"), "x"), "y"), "x"))
+
+    def test_through_nullable(self):
+        self.check_same_as_earley(lr_nullable, "abxyz", 6)
+
+    def test_value_appended_in_place(self):
+        parser = yacc.yacc(module=lr_append)
+        lexer = lex.lex(module=letters_lex)
+        self.assertEqual(parser.parse("1 + 2 + 3", lexer), ["1", "2", "3"])
+        self.assertEqual(parser.parse("4", lexer), ["4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
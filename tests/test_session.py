@@ -0,0 +1,163 @@
+import random
+import unittest
+import lex
+import yacc
+import calc_lex, calc_left, json_lex, json_yacc, letters_lex, lr_indirect, states_lex
+from support import dump_tokens, lex_all
+
+
+JSON_PIECES = ['{"k": [1, 2.5, "v\\tx", true, null]}', ', ', '\n', '"str"', '12', '[', ']',
+               '{', '}', ':', '$', 'tru', 'e', '"', ' ']
+STATES_PIECES = ["abc ", "12", "/*", "*/", " c ", "<", "@tag", ">", "\n", "$", "*"]
+
+
+def random_text(rng, pieces, n):
+    return "".join(rng.choice(pieces) for _ in range(n))
+
+
+def random_edit(rng, text, pieces):
+    start = rng.randint(0, len(text))
+    end = rng.randint(start, min(len(text), start + 10))
+    return start, end, random_text(rng, pieces, rng.randint(0, 3))
+
+
+def parse_result(parser, text, lexer):
+    try:
+        res = parser.parse(text, lexer)
+    except ValueError:  # a lex error
+        return "lex error"
+    return str(res) if isinstance(res, yacc.ParseError) else res
+
+
+class LexSessionTest(unittest.TestCase):
+    def check_edits(self, module, pieces, lazy_positions=False, seed=0):
+        rng = random.Random(seed)
+        for _ in range(40):
+            lexer = lex.lex(module=module, lazy_positions=lazy_positions)
+            session = lex.LexSession(lexer, random_text(rng, pieces, rng.randint(0, 40)),
+                                     interval=rng.choice([1, 2, 5, 64]))
+            for _ in range(5):
+                before = dump_tokens(session.tokens)[0]
+                start, end, replacement = random_edit(rng, session.text, pieces)
+                first, old_end, new_end = session.edit(start, end, replacement)
+                expected = dump_tokens(lex_all(lex.lex(module=module), session.text))
+                after = dump_tokens(session.tokens)
+                self.assertEqual(after, expected, session.text)
+                after = after[0]
+                self.assertEqual(after[:first], before[:first])
+                self.assertEqual(len(before) - old_end, len(after) - new_end)
+                self.assertEqual([t[:2] for t in after[new_end:]],
+                                 [t[:2] for t in before[old_end:]])
+                if not lazy_positions:
+                    for checkpoint in session.checkpoints:
+                        self.assertEqual((checkpoint.lineno, checkpoint.col),
+                                         lex.advance_position(1, 1,
+                                                              session.text[:checkpoint.lexpos]))
+
+    def test_json(self):
+        self.check_edits(json_lex, JSON_PIECES)
+
+    def test_tabs(self):
+        self.check_edits(json_lex, JSON_PIECES + ["\t", "\t\t", "a\tb"], seed=3)
+
+    def test_columns_after_the_edit(self):
+        text = ", ".join(["1"] * 20 + ['"a\tb"', "\t2", "3\n4", "5"])
+        session = lex.LexSession(lex.lex(module=json_lex), text, interval=1)
+        session.edit(0, 1, "123")
+        self.assertEqual(dump_tokens(session.tokens), dump_tokens(lex_all(lex.lex(module=json_lex),
+                                                                          session.text)))
+        # 2 more columns up to the first tab, then to the next tab stop
+        self.assertEqual([(t.lineno, t.pos) for t in session.tokens][-8:],
+                         [(1, 63), (1, 75), (1, 81), (1, 82), (1, 84), (2, 1), (2, 2), (2, 4)])
+
+    def test_lazy_positions(self):
+        self.check_edits(json_lex, JSON_PIECES, lazy_positions=True, seed=1)
+
+    def test_states(self):
+        self.check_edits(states_lex, STATES_PIECES, seed=2)
+
+    def test_damaged_range(self):
+        session = lex.LexSession(lex.lex(module=calc_lex), "1 + 22 * 3 + 4", interval=1)
+        self.assertEqual(session.edit(4, 6, "5"), (2, 3, 3))
+        self.assertEqual(session.text, "1 + 5 * 3 + 4")
+        self.assertEqual(session.edit(9, 9, " + 6"), (5, 5, 7))
+        self.assertEqual([t.value for t in session.tokens], [1, "+", 5, "*", 3, "+", 6, "+", 4])
+
+    def test_bad_arguments(self):
+        lexer = lex.lex(module=calc_lex)
+        with self.assertRaises(ValueError):
+            lex.LexSession(lexer, "1", interval=0)
+        session = lex.LexSession(lexer, "1+2")
+        with self.assertRaises(ValueError):
+            session.edit(2, 4, "")
+
+
+class ParseSessionTest(unittest.TestCase):
+    def check_edits(self, lex_module, module, pieces, seed=0, **options):
+        rng = random.Random(seed)
+        parser = yacc.yacc(module=module, **options)
+        for _ in range(40):
+            lexer = lex.lex(module=lex_module, lazy_positions=rng.random() < 0.5)
+            text = random_text(rng, pieces, rng.randint(0, 20))
+            try:
+                session = parser.session(text, lexer, interval=rng.choice([1, 3, 64]))
+            except ValueError:  # a lex error
+                continue
+            for _ in range(5):
+                start, end, replacement = random_edit(rng, session.text, pieces)
+                try:
+                    tree = session.edit(start, end, replacement)
+                    tree = str(tree) if isinstance(tree, yacc.ParseError) else tree
+                except ValueError:
+                    tree = "lex error"
+                self.assertEqual(tree, parse_result(parser, session.text,
+                                                    lex.lex(module=lex_module)), session.text)
+
+    def test_json(self):
+        pieces = [p for p in JSON_PIECES if p not in ("$", "tru", "e", '"')] + ['"a": 1', ',']
+        self.check_edits(json_lex, json_yacc, pieces)
+        self.check_edits(json_lex, json_yacc, pieces, seed=1, memo_limit=50)
+
+    def test_left_recursion(self):
+        self.check_edits(calc_lex, calc_left, list("1+*() "))
+        self.check_edits(letters_lex, lr_indirect, list("abxyz"), seed=1)
+
+    def test_reuses_the_unchanged_results(self):
+        parser = yacc.yacc(module=json_yacc)
+        text = "[" + ", ".join(['{"k": [1, 2, 3]}'] * 200) + "]"
+        session = parser.session(text, json_lex.lexer)
+        calls = []
+        for production in [production for productions in parser.parser.alternatives
+                           for production in productions]:
+            production.yield_rule = lambda p, rule=production.yield_rule: calls.append(1) or rule(p)
+        first = text.index("3")  # the ELEMENTS after it are reused (they are right-recursive)
+        tree = session.edit(first, first + 1, "4")
+        self.assertLess(len(calls), 50)  # a fresh parse calls them 2602 times
+        self.assertEqual(tree, parser.parse(session.text, json_lex.lexer))
+
+    def test_memo_edit(self):
+        error = yacc.ParseError(lex_all(lex.lex(module=calc_lex), "1")[0])
+        for limit in [100, 20, 5]:  # dense, dense grown past the limit, dict
+            memo = yacc.PackratMemo(2, 10, limit, reaches=True)
+            memo.put(0, 0, (error, None), 0)  # before the edit
+            memo.put(0, 1, ("a", 3), 3)
+            memo.put(1, 2, ("b", 4), 4)       # examined a replaced token
+            memo.put(0, 6, ("c", 8), 8)       # after the edit
+            memo.put(1, 7, (error, None), 7)  # a stale failure
+            memo.edit(4, 6, 8)
+            self.assertEqual(memo.dense, limit == 100)
+            self.assertEqual(memo.get(0, 0), (error, None))
+            self.assertEqual((memo.get(0, 1), memo.reach(0, 1)), (("a", 3), 3))
+            self.assertIsNone(memo.get(1, 2))
+            self.assertEqual((memo.get(0, 8), memo.reach(0, 8)), (("c", 10), 10))
+            self.assertIsNone(memo.get(1, 9))
+            self.assertEqual(memo.width, 12)
+
+    def test_session_is_rd_only(self):
+        for name in ["LALR", "EARLEY"]:
+            with self.assertRaises(ValueError):
+                yacc.yacc(parser=name, module=json_yacc).session("[]", json_lex.lexer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from StringIO import StringIO
+import lex
+import json_lex, states_lex
+
+
+JSON = ('[ "a long string literal with spaces", 12.5, 1234567.125, "x\\"y",\n'
+        '  true, $ null, {"key": "unterminated ]\n') * 5
+STATES = "abc 12 /* a comment * with stars */ x <@tag @other> 77\n /* unterminated"
+
+
+def lex_tokens(lexer):
+    return [(t.type, t.value, t.lexpos, t.lineno, t.pos) if not t.is_error else
+            (t.lexpos, t.lineno, t.pos, t.error_msg) for t in lexer.get_token()]
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in xrange(0, len(text), size)]
+
+
+class InputStreamTest(unittest.TestCase):
+    def check_same_as_input(self, module, text, engine="re"):
+        lexer = lex.lex(module=module, engine=engine)
+        lexer.input(text)
+        expected = lex_tokens(lexer)
+        for chunk_size in range(1, 8) + [64, 1 << 16]:
+            lexer = lex.lex(module=module, engine=engine)  # in the initial state
+            lexer.input_stream(chunks(text, chunk_size), chunk_size=chunk_size)
+            self.assertEqual(lex_tokens(lexer), expected, chunk_size)
+
+    def test_tokens_longer_than_the_chunks(self):
+        self.check_same_as_input(json_lex, JSON)
+
+    def test_states(self):
+        self.check_same_as_input(states_lex, STATES)
+
+    def test_dfa_engine(self):
+        self.check_same_as_input(json_lex, JSON, engine="dfa")
+
+    def test_file_object(self):
+        lexer = lex.lex(module=json_lex)
+        lexer.input(JSON)
+        expected = lex_tokens(lexer)
+        lexer.input_stream(StringIO(JSON), chunk_size=5)
+        self.assertEqual(lex_tokens(lexer), expected)
+
+    def test_window_is_bounded(self):
+        lexer = lex.lex(module=json_lex)
+        lexer.input_stream(chunks(JSON * 20, 100), chunk_size=100)
+        longest = 0
+        for token in lexer.get_token():
+            longest = max(longest, len(lexer.lexdata))
+        self.assertLess(longest, 1000)
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, lex.lex(module=json_lex).input_stream, [], chunk_size=0)
+        lexer = lex.lex(module=json_lex, lazy_positions=True)
+        self.assertRaises(ValueError, lexer.input_stream, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
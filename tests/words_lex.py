@@ -0,0 +1,24 @@
+'''A lexer whose error tokens keep the default value (a view of the rest
+of the input).'''
+tokens = ("word", "num", "string")
+
+t_ignore = " \t"
+t_word = r'[a-z]+'
+
+
+def t_num(t):
+    r'[0-9]+'
+    t.value = int(t.value)
+    return t
+
+
+t_string = r'"[^"]*"'
+
+
+def t_newline(t):
+    r'\n+'
+
+
+def t_error(t):
+    t.lexer.skip(1)
+    return t
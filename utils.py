@@ -1,5 +1,10 @@
+import os
 import inspect
+import hashlib
+import cPickle as pickle
+import multiprocessing
 from functools import partial
+from collections import namedtuple
 from time import clock
 
 
@@ -57,12 +62,38 @@ def categorize(rules, variables):
     return res
 
 
+def memo(fn):
+    '''Memoization decorator.'''
+    cache = {}
+    def _f(*args):
+        try:
+            return cache[args]
+        except KeyError:
+            cache[args] = result = fn(*args)
+            return result
+        except TypeError:  # unhashable args
+            return fn(*args)
+    return _f
+
+
 def by_appearance(frame, var):
     name, value = var
     if inspect.isframe(frame):
         return frame.f_code.co_names.index(name)
     elif inspect.ismodule(frame):
-        pass
+        names = module_names(frame)
+        return names.index(name) if name in names else len(names)
+
+
+@memo
+def module_names(module):
+    '''Return the global names of a module in the order of appearance in
+    its source (like frame.f_code.co_names); () if there is no source.'''
+    try:
+        source = inspect.getsource(module)
+    except (IOError, TypeError):
+        return ()
+    return compile(source, inspect.getsourcefile(module) or "<module>", "exec").co_names
 
 
 def split(text, sep=None, maxsplit=-1):
@@ -76,21 +107,6 @@ def timedcall(fn, *args, **kwgs):
     return result, clock()-t
 
 
-def memo(fn):
-    '''Memoization decorator.'''
-    cache = {}
-    def _f(*args):
-        try:
-            return cache[args]
-        except KeyError:
-            cache[args] = result = fn(*args)
-            return result
-        except TypeError:  # unhashable args
-            return fn(*args)
-    return _f
-        
-
-
 def for_all(predicate, L):
     '''Return True if predicate is True for all elements in L.'''
     return all(map(predicate, L))
@@ -107,3 +123,79 @@ def partition(pred, xs):
     for x in xs:
         (t if pred(x) else f).append(x)
     return t, f
+
+
+
+BatchResult = namedtuple("BatchResult", "index result error")
+
+_batch_job = None  # the function mapped by map_batch, shared with the forked workers
+
+
+def map_batch(fn, items, workers=None, chunksize=1, ordered=True):
+    '''Yield a BatchResult(index, result, error) of fn(item) for each item
+    (error is a message if fn raised an exception). The items are
+    processed by a pool of forked worker processes (in this process if
+    workers == 1); fn and everything it uses is inherited by the workers,
+    so only the items and the results are pickled. If ordered is False,
+    the results are yielded as soon as they are ready.'''
+    global _batch_job
+    workers = workers or multiprocessing.cpu_count()
+    if workers == 1:
+        for index, item in enumerate(items):
+            yield _call_batch_job(fn, (index, item))
+        return
+
+    _batch_job = fn
+    pool = multiprocessing.Pool(workers)
+    _batch_job = None
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for result in imap(_run_batch_job, enumerate(items), chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run_batch_job(indexed_item):
+    return _call_batch_job(_batch_job, indexed_item)
+
+
+def _call_batch_job(fn, (index, item)):
+    try:
+        return BatchResult(index, fn(item), None)
+    except Exception as e:
+        return BatchResult(index, None, "%s: %s" % (type(e).__name__, e))
+
+
+
+CACHE_VERSION = 2  # changed when the format of the cached tables changes
+
+
+def signature(*parts):
+    '''Return a hash of parts (a key of cached tables): the tables are
+    valid as long as the specification they were built from is the same.'''
+    return hashlib.sha1(repr((CACHE_VERSION,) + parts)).hexdigest()
+
+
+def load_cache(path, key):
+    '''Return the data saved to the cache file at path under key; None if
+    the file is missing, unreadable or saved for another key.'''
+    try:
+        with open(path, "rb") as f:
+            saved_key, data = pickle.load(f)
+    except Exception:  # missing, corrupt or written by an incompatible version
+        return None
+    return data if saved_key == key else None
+
+
+def save_cache(path, key, data):
+    '''Save data under key to the cache file at path (replaced atomically,
+    so concurrent readers never see a partial file).'''
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump((key, data), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, path)
+    except (IOError, OSError) as e:
+        print "WARNING: can't write the cache file %r: %s" % (path, e)
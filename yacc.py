@@ -3,36 +3,54 @@
 
 
 import sys
+import operator
+from array import array
 from functools import partial
+from itertools import imap, compress
 from collections import defaultdict
-from lex import LexToken
 from utils import (get_global_vars,
                    by_appearance,
                    filter_variables,
                    categorize,
                    split,
-                   memo,
-                   partition)
+                   map_batch,
+                   signature,
+                   load_cache,
+                   save_cache)
+from lex import LexToken, LexSession, CHECKPOINT_INTERVAL
 
 
 
 
 
 EPSILON = "EPSILON_TRANSITION_DUMMY"
+EPSILON_ID = -1  # symbol id of EPSILON
+NO_SYMBOL = -2   # id of a token unknown to the grammar
+END_ID = -3      # id of the end of input
+END = "$end"     # name of the end of input in EarleyParser.expected_tokens
 
 
-def is_epsilon_transition(tok_name):
-    return tok_name == EPSILON
+def is_epsilon_transition(symbol):
+    return symbol == EPSILON_ID
 
 
 
 
 class Yacc(object):
-    def __init__(self, parser="RD", module=None):
-        self.parser = self._get_parser(parser)(module)
+    def __init__(self, parser="RD", module=None, cachefile=None, **options):
+        '''options are passed to the parser class (eg memo_limit of RD).'''
+        parser_class = self._get_parser(parser)
+        if cachefile is None:
+            self.parser = parser_class(module, **options)
+        elif hasattr(parser_class, "tables"):
+            self.parser = parser_class(module, cachefile=cachefile, **options)
+        else:
+            raise ValueError("%s parser has no tables to cache" % parser)
 
     def _get_parser(self, parser_name):
         available_parsers = {"EARLEY": EarleyParser,
+                             "LALR": LALRParser,
+                             "LL1": LL1Parser,
                              "RD": RecursiveDescentParser}
         parser = available_parsers.get(parser_name)
         if parser is not None:
@@ -43,6 +61,47 @@ class Yacc(object):
     def parse(self, text, lexer, tokenfunc=None):
         return self.parser.parse(text, lexer, tokenfunc=tokenfunc)
 
+    def parse_many(self, texts, lexer, workers=None, chunksize=1, ordered=True, tokenfunc=None):
+        '''Parse many texts using a pool of worker processes, yielding a
+        BatchResult(index, tree, error) per text; error is the message of
+        an exception raised while parsing the text or of a syntax error
+        (a ParseError or a None result).
+        The workers are forked, so the grammar and the lexer are built
+        once. If workers == 1, the texts are parsed in this process; if
+        ordered is False, the results are yielded as soon as they are
+        ready. See utils.map_batch.'''
+        return map_batch(partial(self._parse_document, lexer, tokenfunc),
+                         texts, workers, chunksize, ordered)
+
+    def parse_all(self, text, lexer, tokenfunc=None):
+        '''Yield the values of all the derivations of an ambiguous text
+        (EARLEY only, see EarleyParser.parse_all).'''
+        if not hasattr(self.parser, "parse_all"):
+            raise ValueError("only the EARLEY parser can return all derivations")
+        return self.parser.parse_all(text, lexer, tokenfunc=tokenfunc)
+
+    def start(self, tokenfunc=None):
+        '''Return a new recognizer, to be fed the tokens one at a time
+        (EARLEY only, see EarleyParser.start).'''
+        if not hasattr(self.parser, "start"):
+            raise ValueError("only the EARLEY parser can be fed tokens")
+        return self.parser.start(tokenfunc)
+
+    def session(self, text, lexer, tokenfunc=None, interval=CHECKPOINT_INTERVAL):
+        '''Return a ParseSession of text, to parse it again after edits
+        (RD only).'''
+        if not hasattr(self.parser, "parse_tokens"):
+            raise ValueError("only the RD parser can parse a text incrementally")
+        return ParseSession(self.parser, text, lexer, tokenfunc, interval)
+
+    def _parse_document(self, lexer, tokenfunc, text):
+        tree = self.parse(text, lexer, tokenfunc)
+        if isinstance(tree, ParseError):
+            raise SyntaxError("unexpected token %s" % tree)
+        if tree is None:  # EARLEY reports a syntax error this way
+            raise SyntaxError("the text can't be parsed")
+        return tree
+
 
 
 yacc = Yacc  # type alias
@@ -57,9 +116,119 @@ class Grammar(object):
         self.start_symbol = info.production_rules[0].head
         self.token_names = info.tokens
 
+        self.symbol_names = info.symbol_names  # symbol id => name
+        self.symbol_ids = info.symbol_ids
+        self.start_id = self.symbol_ids[self.start_symbol]
+
         self.grammar = defaultdict(list)
+        self.alternatives = [[] for _ in self.symbol_names]  # symbol id => productions
         for rule in info.production_rules:
             self.grammar[rule.head].append(rule)
+            self.alternatives[rule.head_id].append(rule)
+        self._compute_first_sets()
+        self._compute_follow_sets()
+
+
+    def _compute_first_sets(self):
+        '''Compute 'nullable' (the ids of the symbols deriving epsilon) and
+        'first' (symbol id => ids of the tokens a derivation of the symbol
+        can start with).'''
+        self.nullable = set()
+        self.first = [set() if alternatives else set([symbol])
+                      for symbol, alternatives in enumerate(self.alternatives)]
+        changed = True
+        while changed:
+            changed = False
+            for productions in self.alternatives:
+                for production in productions:
+                    first = self.first[production.head_id]
+                    size = len(first)
+                    if self._add_first(first, production.body_ids):
+                        if production.head_id not in self.nullable:
+                            self.nullable.add(production.head_id)
+                            changed = True
+                    changed |= len(first) <> size
+
+
+    def _compute_follow_sets(self):
+        '''Compute 'follow' (symbol id => ids of the tokens, or END_ID, that
+        can follow the symbol in a sentential form).'''
+        self.follow = [set() for _ in self.symbol_names]
+        self.follow[self.start_id].add(END_ID)
+        changed = True
+        while changed:
+            changed = False
+            for productions in self.alternatives:
+                for production in productions:
+                    body = production.body_ids
+                    for i, symbol in enumerate(body):
+                        if is_epsilon_transition(symbol) or not self.alternatives[symbol]:
+                            continue
+                        follow = self.follow[symbol]
+                        size = len(follow)
+                        follow |= self.first_of(body[i + 1:], self.follow[production.head_id])
+                        changed |= len(follow) <> size
+
+
+    def _add_first(self, first, symbols):
+        '''Add the FIRST set of a sequence of symbol ids to first; return
+        True if the sequence is nullable.'''
+        for symbol in symbols:
+            if not is_epsilon_transition(symbol):
+                first |= self.first[symbol]
+                if symbol not in self.nullable:
+                    return False
+        return True
+
+
+    def first_of(self, symbols, follow=()):
+        '''Return the FIRST set of a sequence of symbol ids followed by a
+        symbol of follow.'''
+        first = set()
+        if self._add_first(first, symbols):
+            first.update(follow)
+        return first
+
+
+    def signature(self):
+        '''Return a hash of the tokens and the productions of the grammar.'''
+        productions = [str(production) for productions in self.alternatives
+                       for production in productions]
+        return signature(type(self).__name__, tuple(self.token_names),
+                         self.start_symbol, productions)
+
+
+    def token_types(self, tokens):
+        '''Return the type ids of a TokenBuffer as grammar symbol ids
+        (they are the same if the lexer and the grammar share 'tokens').'''
+        if tokens.type_names == tuple(self.token_names):
+            return tokens.types
+        ids = [self.symbol_ids[name] if name in self.token_names else NO_SYMBOL
+               for name in tokens.type_names]
+        return [ids[type_id] for type_id in tokens.types]
+
+
+    def error_at(self, tokens, token_num):
+        '''Return the ParseError of the token token_num of a TokenBuffer
+        (of a $end token past the last one).'''
+        if token_num < len(tokens):
+            return ParseError(tokens[token_num])
+        return ParseError(self.end_token_of(tokens))
+
+
+    def end_token_of(self, tokens):
+        '''Return the $end token reported by a parse error at the end of
+        the tokens of a TokenBuffer.'''
+        end_token = LexToken()
+        end_token.type, end_token.value = "$end", None
+        end_token.lexer = lexer = tokens.lexer
+        if tokens.data is None:  # a stream: the lexer is at its end
+            end_token.lexpos = lexer.lexbase + lexer.lexpos
+            end_token.lineno, end_token.pos = lexer.lineno, lexer.lexcol
+        else:
+            end_token.lexpos, end_token.lines = len(tokens.data), tokens.lines
+            end_token.lineno = end_token.pos = None  # computed from lexpos
+        return end_token
 
 
 
@@ -92,234 +261,1243 @@ class ParseError(object):
 
 
 FAIL = (None, None)
+
+
+
+class PackratMemo(object):
+    '''Results (tree, next token index) of the memoized nonterminals of
+       one input, indexed by token index x memo slot. It is a dense list if
+       it has at most 'limit' entries, otherwise a dict that keeps at most
+       'limit' results (the later ones are not memoized). A result is
+       stored relative to its token index (tree, number of tokens), so
+       that an edit moves the results after it without touching them.
+
+       If reaches is true, the index of the last token examined to get
+       each result is kept too (relative as well, with the largest one of
+       each token index), so that the results can be reused after an edit
+       (edit).'''
+
+    def __init__(self, num_slots, num_positions, limit, reaches=False):
+        self.num_slots, self.width, self.limit = num_slots, num_positions, limit
+        size = num_slots * num_positions
+        self.dense = size <= limit
+        self.table = [None] * size if self.dense else {}
+        self.reaches = ([0] * size if self.dense else {}) if reaches else None
+        if reaches:
+            self.row_reaches = array('l', [0]) * num_positions  # token index => largest reach
+            self.failures = set()  # keys of the failed results
+
+    def get(self, slot, token_num):
+        key = token_num * self.num_slots + slot
+        result = self.table[key] if self.dense else self.table.get(key)
+        if result is None or result[1] is None:
+            return result
+        return result[0], token_num + result[1]
+
+    def reach(self, slot, token_num):
+        return token_num + self.reaches[token_num * self.num_slots + slot]
+
+    def extend_reach(self, slot, token_num, reach):
+        '''The result at token_num depends on the tokens up to reach too.'''
+        key = token_num * self.num_slots + slot
+        if self._entry(key) is not None:
+            self._set_reach(key, token_num, max(self.reaches[key], reach - token_num))
+
+    def discard(self, slot, token_num):
+        key = token_num * self.num_slots + slot
+        if self.dense:
+            self.table[key] = None
+        else:
+            self.table.pop(key, None)
+        if self.reaches is not None:
+            self.failures.discard(key)
+
+    def put(self, slot, token_num, result, reach):
+        if self.dense or len(self.table) < self.limit:
+            key = token_num * self.num_slots + slot
+            tree, i = result
+            self.table[key] = result if i is None else (tree, i - token_num)
+            if self.reaches is not None:
+                self._set_reach(key, token_num, reach - token_num)
+                if i is None:
+                    self.failures.add(key)
+                else:
+                    self.failures.discard(key)
+
+    def _entry(self, key):
+        return self.table[key] if self.dense else self.table.get(key)
+
+    def _set_reach(self, key, token_num, reach):
+        self.reaches[key] = reach
+        if reach > self.row_reaches[token_num]:
+            self.row_reaches[token_num] = reach
+
+    def edit(self, first, old_end, new_end):
+        '''Update the memo in place after the tokens first..old_end-1 were
+        replaced by the tokens first..new_end-1: the results that examined
+        only tokens before first are kept, the results of nonterminals that
+        start at or after old_end are moved, the others are dropped.
+        Failures after the edit are dropped too, as their positions are
+        stale. Besides the failures, only the token indices before first
+        whose largest reach crosses the edit are visited; the rows of the
+        replaced tokens are spliced (a dict memo is rebuilt).'''
+        slots, table, reaches = self.num_slots, self.table, self.reaches
+        crossing = list(compress(xrange(first), imap(operator.ge, self.row_reaches,
+                                                     xrange(first, 0, -1))))
+        for token_num in crossing:
+            largest = 0
+            for key in xrange(token_num * slots, (token_num + 1) * slots):
+                if self._entry(key) is None:
+                    continue
+                if token_num + reaches[key] >= first:
+                    self.discard(key % slots, token_num)
+                else:
+                    largest = max(largest, reaches[key])
+            self.row_reaches[token_num] = largest
+        for key in [key for key in self.failures if key >= first * slots]:
+            self.discard(key % slots, key // slots)
+        self.width += new_end - old_end
+        start, end, new = first * slots, old_end * slots, (new_end - first) * slots
+        self.row_reaches[first:old_end] = array('l', [0]) * (new_end - first)
+        if self.dense:
+            table[start:end] = [None] * new
+            reaches[start:end] = [0] * new
+            if len(table) > self.limit:  # too large for a dense list now
+                self.dense = False
+                self.table = dict((key, result) for key, result in enumerate(table)
+                                  if result is not None)
+                self.reaches = dict((key, reaches[key]) for key in self.table)
+        else:
+            moved = new - (end - start)
+            self.table = dict((key if key < start else key + moved, result)
+                              for key, result in table.iteritems()
+                              if key < start or key >= end)
+            self.reaches = dict((key if key < start else key + moved, reach)
+                                for key, reach in reaches.iteritems()
+                                if key < start or key >= end)
             
             
+def _reachable(graph, starts, excluded):
+    '''Return the nodes reachable from starts in graph (node => successors)
+    on paths avoiding the excluded nodes.'''
+    res = set(node for node in starts if node not in excluded)
+    stack = list(res)
+    while stack:
+        for node in graph[stack.pop()]:
+            if node not in res and node not in excluded:
+                res.add(node)
+                stack.append(node)
+    return res
+
+
+
+class RDCall(object):
+    '''A call of a nonterminal in RecursiveDescentParser.parse_atom: the
+       alternatives left to try and the values parsed by the current one.'''
+
+    __slots__ = ("atom", "start", "alternatives", "next", "production", "values", "pos", "errors",
+                 "reach")
+
+    def __init__(self, atom, start, alternatives):
+        self.atom, self.start = atom, start
+        self.alternatives = alternatives
+        self.reach = start  # the last token examined (by all the alternatives)
+        self.restart()
+
+    def restart(self):
+        self.next = 0
+        self.production = None  # the alternative being parsed
+        self.values, self.pos = [None], self.start
+        self.errors = []
+
+
+
+MEMO_LIMIT = 1 << 22  # entries of a PackratMemo (a dense one takes 8 bytes per entry)
+
+
 class RecursiveDescentParser(Grammar):
-    def __init__(self, module=None):
+    '''Backtracking recursive descent parser (ordered choice) with a
+       packrat memo of the results of the nonterminals for each input.
+       memo_limit caps the number of memo entries (see PackratMemo);
+       memoize is a collection of the names of the nonterminals to memoize
+       (all of them by default): a nonterminal that is never parsed twice
+       at the same position (its callers don't backtrack over it) doesn't
+       need the memo.
+
+       Left recursion (direct or indirect) is parsed by growing a seed: a
+       head of left recursion at a position first fails when it is called
+       from itself, then its alternatives are parsed again and again with
+       the previous result as the result of the recursive call, as long as
+       it consumes more tokens (Warth et al., "Packrat parsers can support
+       left recursion"). While it grows, an alternative that doesn't
+       consume more tokens than the previous result is skipped, so that a
+       later alternative can grow it.'''
+
+    def __init__(self, module=None, memo_limit=MEMO_LIMIT, memoize=None):
         Grammar.__init__(self, module)
         self.nonterminals = set(self.grammar.keys())
+        self.predictions = map(self._predict, self.alternatives)
+
+        self.memo_limit, self.memo = memo_limit, None
+        memoize = self.nonterminals if memoize is None else set(memoize)
+        unknown = memoize - self.nonterminals
+        if unknown:
+            raise ValueError("unknown nonterminals to memoize: %s" % ", ".join(sorted(unknown)))
+        self.memo_slots = [-1] * len(self.symbol_names)  # symbol id => memo slot
+        for slot, name in enumerate(sorted(memoize, key=self.symbol_ids.get)):
+            self.memo_slots[self.symbol_ids[name]] = slot
+        self.num_memo_slots = len(memoize)
+        self._find_left_recursion()
+        self.seeds = None
+
+
+    def _find_left_recursion(self):
+        '''Choose the heads of left recursion so that every cycle of left
+        calls (calls of nonterminals before a token is consumed) goes
+        through a head. The other nonterminals of the cycles are not
+        memoized, since their results depend on the seed of a head; the
+        result of a head depends on the seeds of the heads of the same
+        cycles ('lr_peers').'''
+        left_calls = [set() for _ in self.symbol_names]
+        for productions in self.alternatives:
+            for production in productions:
+                for symbol in production.body_ids:
+                    if is_epsilon_transition(symbol):
+                        continue
+                    if self.alternatives[symbol]:
+                        left_calls[production.head_id].add(symbol)
+                    if symbol not in self.nullable:
+                        break
+        reach = [_reachable(left_calls, calls, ()) for calls in left_calls]
+        recursive = [symbol for symbol, reachable in enumerate(reach) if symbol in reachable]
+        heads = []
+        for symbol in recursive:
+            if symbol in _reachable(left_calls, left_calls[symbol], heads):
+                heads.append(symbol)
+        self.lr_heads = set(heads)
+        self.lr_peers = {head: [peer for peer in heads if peer <> head and
+                                peer in reach[head] and head in reach[peer]]
+                         for head in heads}
+        for symbol in recursive:
+            if symbol not in self.lr_heads:
+                self.memo_slots[symbol] = -1
+
+
+    def _predict(self, alternatives):
+        '''Return {token id: the alternatives that can start with the token}.
+        A nullable alternative can start with any token, so it is in every
+        entry; the entry of END_ID (also used for the tokens not listed)
+        has only the nullable alternatives.'''
+        nullable = [self._add_first(set(), production.body_ids) for production in alternatives]
+        firsts = [self.first_of(production.body_ids) for production in alternatives]
+        prediction = {}
+        for token in set([END_ID]).union(*firsts):
+            prediction[token] = tuple(production for production, first, null
+                                      in zip(alternatives, firsts, nullable)
+                                      if null or token in first)
+        return prediction
 
         
     def parse(self, text, lexer, tokenfunc=None, skip_lexerrors=False):
-        self.tokenfunc = tokenfunc or (lambda token: token.value)
         lexer.input(text)
-        
-        self.tokens, lexerrors = partition(lambda token: not token.is_error,
-                                           list(lexer.get_token()))
-        if lexerrors != [] and not skip_lexerrors:
-            raise ValueError(str(lexerrors[0]))
-            
-        tree, i = self.parse_atom(self.start_symbol, 0)
+        return self.parse_tokens(lexer.tokenize(), tokenfunc, skip_lexerrors)
+
+
+    def parse_tokens(self, tokens, tokenfunc=None, skip_lexerrors=False, memo=None):
+        '''Parse a TokenBuffer. memo is the PackratMemo of the tokens to
+        fill (a new one by default); ParseSession keeps it to parse the
+        tokens again after an edit.'''
+        self.tokenfunc = tokenfunc or (lambda token: token.value)
+        self.tokens = tokens
+        if self.tokens.errors != [] and not skip_lexerrors:
+            raise ValueError(str(self.tokens.errors[0]))
+        self.types = self.token_types(self.tokens)
+        self.end_token = self.end_token_of(tokens)
+
+        if memo is None:
+            memo = PackratMemo(self.num_memo_slots, len(self.tokens) + 1, self.memo_limit)
+        self.memo = memo
+        self.seeds = {}  # (head, token_num) => the result so far of a growing head
+        try:
+            tree, i = self.parse_atom(self.start_id, 0)
+        finally:
+            self.memo = self.seeds = None
         return tree
 
         
-    @memo
     def parse_atom(self, atom, token_num):
-        alternatives = self.grammar.get(atom)
-        if alternatives is not None:  # if atom is a nonterminal
-            errors = []
-            for production in alternatives:
-                tree, i = self.parse_sequence(production, token_num)
-                if not isinstance(tree, ParseError):
-                    return tree, i
-                errors.append(tree)
-            return ParseError.mergeParseErrorsMany(*errors), None
-        else:
-            if is_epsilon_transition(atom):
-                return [], token_num
-            elif self.token_matched(atom, token_num):
+        '''Return (tree, next token index) of atom parsed at token_num, or
+        (ParseError, None). The calls of nonterminals are frames (RDCall)
+        of an explicit stack, so the nesting of the input is limited by
+        memory only, not by the recursion limit.'''
+        stack = []
+        result = self._call(stack, atom, token_num)
+        while stack:
+            call = stack[-1]
+            if result is not None:  # the result of the current atom of call
+                tree, i = result
+                if isinstance(tree, ParseError):
+                    call.errors.append(tree)
+                    call.production = None  # the alternative failed
+                else:
+                    call.values.append(tree)
+                    call.pos = i
+                result = None
+            if call.production is not None:
+                body = call.production.body_ids
+                if len(call.values) <= len(body):
+                    result = self._call(stack, body[len(call.values) - 1], call.pos)
+                elif self._no_progress(call):  # a later alternative may grow the seed
+                    call.production = None
+                else:  # the alternative matched
+                    call.production.yield_rule(call.values)
+                    result = self._return(stack, (call.values[0], call.pos))
+            elif call.next < len(call.alternatives):
+                call.production = call.alternatives[call.next]
+                call.next += 1
+                call.values, call.pos = [None], call.start
+            elif call.errors:
+                result = self._return(stack, (ParseError.mergeParseErrorsMany(*call.errors), None))
+            else:  # no alternative can start with the token
+                result = self._return(stack, (self.parse_error(call.start), None))
+        return result
+
+
+    def _call(self, stack, atom, token_num):
+        '''Return the result of atom at token_num if it is known without
+        parsing a nonterminal; otherwise push a call of it and return None.'''
+        if is_epsilon_transition(atom):
+            return [], token_num
+        if not self.alternatives[atom]:
+            if stack and stack[-1].reach < token_num:
+                stack[-1].reach = token_num
+            if self.token_matched(atom, token_num):
                 return self.tokenfunc(self.tokens[token_num]), token_num + 1
-            else:
-                return ParseError(self.tokens[token_num]), None
+            return self.parse_error(token_num), None
+        slot = self.memo_slots[atom]
+        if slot >= 0:
+            result = self.memo.get(slot, token_num)
+            if result is not None:
+                if stack and self.memo.reaches is not None:
+                    stack[-1].reach = max(stack[-1].reach, self.memo.reach(slot, token_num))
+                return result
+        if atom in self.lr_heads:
+            seed = self.seeds.get((atom, token_num))
+            if seed is not None:  # a recursive call of a growing head
+                return seed
+            self.seeds[atom, token_num] = self.parse_error(token_num), None
+        prediction = self.predictions[atom]
+        stack.append(RDCall(atom, token_num,
+                            prediction.get(self._token_type(token_num), prediction[END_ID])))
+        return None
+
+
+    def _no_progress(self, call):
+        '''Return True if call is a growing head of left recursion and its
+        alternative doesn't consume more tokens than the seed.'''
+        if call.atom not in self.lr_heads:
+            return False
+        seed = self.seeds.get((call.atom, call.start))
+        return seed is not None and seed[1] is not None and call.pos <= seed[1]
+
+
+    def _return(self, stack, result):
+        '''Pop the call on the top of the stack and return its result; if it
+        is a head of left recursion that has grown, parse it again (return
+        None).'''
+        call = stack[-1]
+        key = call.atom, call.start
+        if key in self.seeds:
+            seed = self.seeds[key]
+            if not isinstance(result[0], ParseError) and (isinstance(seed[0], ParseError) or
+                                                          result[1] > seed[1]):
+                self.seeds[key] = result
+                for peer in self.lr_peers[call.atom]:  # their results used the old seed
+                    if self.memo_slots[peer] >= 0:
+                        self.memo.discard(self.memo_slots[peer], call.start)
+                call.restart()
+                return None
+            del self.seeds[key]
+            if self.memo.reaches is not None:  # their results used the seed
+                for peer in self.lr_peers[call.atom]:
+                    if self.memo_slots[peer] >= 0:
+                        self.memo.extend_reach(self.memo_slots[peer], call.start, call.reach)
+            if not isinstance(seed[0], ParseError):
+                result = seed
+        stack.pop()
+        if stack and stack[-1].reach < call.reach:
+            stack[-1].reach = call.reach
+        slot = self.memo_slots[call.atom]
+        if slot >= 0:
+            self.memo.put(slot, call.start, result, call.reach)
+        return result
+
+
+    def token_matched(self, token_id, token_num):
+        return  (token_num < len(self.types) and
+                token_id == self.types[token_num])
+
+
+    def _token_type(self, token_num):
+        if token_num < len(self.types):
+            return self.types[token_num]
+        return END_ID
+
+
+    def parse_error(self, token_num):
+        if token_num < len(self.tokens):
+            return ParseError(self.tokens[token_num])
+        return ParseError(self.end_token)
+
+
+
+
+class ParseSession(object):
+    '''The tree of a text that is edited, parsed by a
+       RecursiveDescentParser. The tokens are kept by a LexSession and the
+       results of the nonterminals by a PackratMemo; after an edit, the
+       results that don't depend on the edited tokens are reused, so only
+       the nonterminals that span the edit (and the ones that examined its
+       tokens) are parsed again.
+
+       The reused trees are shared with the previous tree: the actions
+       must not modify their arguments, and tokenfunc must not depend on
+       the positions of the tokens (they are shifted by an edit).'''
+
+    def __init__(self, parser, text, lexer, tokenfunc=None, interval=CHECKPOINT_INTERVAL):
+        self.parser, self.tokenfunc = parser, tokenfunc
+        self.lex_session = LexSession(lexer, text, interval)
+        tokens = self.lex_session.tokens
+        self.memo = PackratMemo(parser.num_memo_slots, len(tokens) + 1, parser.memo_limit,
+                                reaches=True)
+        self.tree = self._parse()
+
+
+    @property
+    def text(self):
+        return self.lex_session.text
+
+
+    def edit(self, start, end, replacement):
+        '''Replace text[start:end] with replacement and return the new tree
+        (or ParseError).'''
+        first, old_end, new_end = self.lex_session.edit(start, end, replacement)
+        self.memo.edit(first, old_end, new_end)
+        self.tree = self._parse()
+        return self.tree
+
 
-
-    def parse_sequence(self, production, token_num):
-        result = [None]
-        for atom in production.body:
-            tree, token_num = self.parse_atom(atom, token_num)
-            if isinstance(tree, ParseError):
-                return tree, None
-            result.append(tree)
-        production.yield_rule(result)
-        return result[0], token_num
-
-
-    def token_matched(self, token_name, token_num):
-        return  (token_num < len(self.tokens) and
-                token_name == self.tokens[token_num].type)
+    def _parse(self):
+        return self.parser.parse_tokens(self.lex_session.tokens, self.tokenfunc, memo=self.memo)
 
 
 
 
     
 class EarleyParser(Grammar):
-    def __init__(self, module=None):
+    '''Earley parser. The chart has a set of items per token index
+       (EarleySet); each set is processed once as a worklist. An item
+       predicting a nullable symbol is advanced over it right away
+       (Aycock and Horspool), its value being the complete item of the
+       symbol that derives the empty string there (an EmptyLink resolved
+       once the set is processed).
+
+       The prediction closure of every nonterminal (the productions
+       predicted by it transitively) is computed with the grammar, as a
+       bitset of the predicted symbols and a list of productions. A set
+       records the symbols predicted in it as a bitset, so a prediction is
+       a lookup and a union; only the items of the closure that can read
+       the next token (or derive the empty string) are created, the others
+       could never be advanced.
+
+       If leo is True, a chain of completions that is deterministic (the
+       completed symbol is the last one of the only item waiting for it)
+       is skipped with Leo's transitive items: only the topmost item of the
+       chain is added, so right recursion takes linear time.
+
+       The chart is a shared packed parse forest: an item refers to the
+       item it was advanced from (left) and to the value of the symbol it
+       advanced over (the complete item of a nonterminal), and the other
+       ways an item is derived are packed into it instead of being
+       dropped. The p_ functions are called once the parse is over, only
+       for the derivation that is returned (the first one found), or for
+       each derivation walked by parse_all.'''
+
+    def __init__(self, module=None, leo=True):
         Grammar.__init__(self, module)
-        self.chart = None
-
-
-    def add_to_chart(self, state, index):
-        if state not in self.chart[index]:
-            self.chart[index].append(state)
-            return True
-        return False
-
-
-    def predict(self, state, index):
-        res = []
-        if state.after <> ():
-            productions = self.grammar.get(state.after[0])
-            if productions is not None:
-                res = [ChartState(head=prod.head,
-                                  after=prod.body,
-                                  start=index,
-                                  yield_rule=prod.yield_rule)
-                       for prod in productions]
-        return res
+        self.productions = [production for productions in self.alternatives
+                            for production in productions]
+        self.bodies = [tuple(symbol for symbol in production.body_ids
+                             if not is_epsilon_transition(symbol))
+                       for production in self.productions]
+        self.starts = []  # production index => (FIRST set of the body, body is nullable)
+        for body in self.bodies:
+            first = set()
+            self.starts.append((first, self._add_first(first, body)))
+        self.closures = self._prediction_closures()
+        self.predictions = {}  # (symbol id, next token id) => (bitset, productions to add)
+        self.token_ids = dict((name, self.symbol_ids[name]) for name in self.token_names)
+        self.leo = leo
+
+
+    def _prediction_closures(self):
+        '''Return symbol id => (bitset of the symbols, indices of the
+        productions) predicted by the symbol, directly or not.'''
+        predicts = [set() for _ in self.symbol_names]
+        for n, body in enumerate(self.bodies):
+            for symbol in body:
+                if self.alternatives[symbol]:
+                    predicts[self.productions[n].head_id].add(symbol)
+                if symbol not in self.nullable:
+                    break
+        closures = []
+        for symbol, alternatives in enumerate(self.alternatives):
+            if not alternatives:
+                closures.append(None)
+                continue
+            symbols = _reachable(predicts, [symbol], ())
+            mask = sum(1 << s for s in symbols)
+            closures.append((mask, [n for n, production in enumerate(self.productions)
+                                    if production.head_id in symbols]))
+        return closures
 
 
-    def scanning(self, state, token):
-        if state.after <> () and state.after[0] == self._get_token_type(token):
-            return ChartState(state.head, before=state.before + (state.after[0],),
-                              after=state.after[1:], start=state.start,
-                              yield_rule=state.yield_rule,
-                              tree=self._process_token(state.tree, token))
-
-
-    def complete(self, state):
-        res = []
-        if state.after == ():
-            states = filter(lambda s: s.after <> () and
-                            state.head == s.after[0], self.chart[state.start])
-            res = [ChartState(s.head,
-                              s.before + (s.after[0],),
-                              s.after[1:],
-                              s.start,
-                              self._append_to_tree(s.tree, state),
-                              s.yield_rule)
-                   for s in states]
-        return res
-        
+    def parse(self, text, lexer, tokenfunc=None):
+        return self._recognize(text, lexer, tokenfunc).finish()
+
 
+    def parse_all(self, text, lexer, tokenfunc=None):
+        '''Yield the value of every derivation of text (none if it can't be
+        parsed), computing them one at a time; the first one is the value
+        returned by parse. Cyclic derivations (A => ... => A over the same
+        tokens) are left out.'''
+        recognizer = self._recognize(text, lexer, tokenfunc)
+        for item in recognizer._goal_items():
+            for value in recognizer._derivations(item):
+                yield value
 
-    def _process_token(self, tree, token):
-        return tree + [self.tokenfunc(token)]
 
+    def _recognize(self, text, lexer, tokenfunc):
+        '''Return a recognizer fed the tokens of text as they are lexed
+        (lex errors are skipped), up to the first one that is rejected.'''
+        recognizer = self.start(tokenfunc)
+        lexer.input(text)
+        for token in lexer.get_token():
+            if not token.is_error and not recognizer.feed(token):
+                break
+        return recognizer
 
-    def _append_to_tree(self, tree, state):
-        state.yield_rule(state.tree)
-        return tree + [state.tree[0]]
 
+    def start(self, tokenfunc=None):
+        '''Start a push-style parse: return a new EarleyRecognizer, to be
+        fed the tokens one at a time; its finish returns the value.'''
+        return EarleyRecognizer(self, tokenfunc)
 
-    def parse(self, text, lexer, tokenfunc=None):
+
+
+
+class EarleyRecognizer(object):
+    '''A parse of an EarleyParser: the tokens fed so far and their chart
+       (a set of items per token index, see EarleyParser). Each parse has
+       its own recognizer, so the parses of a parser are independent.'''
+
+    def __init__(self, parser, tokenfunc=None):
+        self.parser = parser
         self.tokenfunc = tokenfunc or (lambda token: token.value)
-        lexer.input(text)
-        tokens = lexer.get_token()  # token generator
-        self.chart = defaultdict(list)
-
-        for prod in self.grammar[self.start_symbol]:
-            state = ChartState(head=prod.head,
-                               after=prod.body,
-                               yield_rule=prod.yield_rule)
-            self.add_to_chart(state, 0)
-
-        tokens = filter(lambda t: not t.is_error, tokens)
-
-        index = -1
-        for index, token in enumerate(tokens):
-            self._update_chart(index, token)
-        self._update_chart(index+1, self._dummy_token())
-
-        for state in self.chart[lexer.num_tokens]:
-            if self._is_goal_state(state):
-                state.yield_rule(state.tree)
-                return state.tree[0]
-            
+        self.bodies, self.productions = parser.bodies, parser.productions
+        self.alternatives, self.nullable = parser.alternatives, parser.nullable
+        self.starts, self.closures = parser.starts, parser.closures
+        self.predictions = parser.predictions  # shared by the recognizers
+        self.token_ids, self.start_id, self.leo = parser.token_ids, parser.start_id, parser.leo
+        self.tokens, self.types = [], []  # the tokens fed, their symbol ids
+        self.chart = [EarleySet()]
+        self.viable, self.finished = True, False
+
+
+    def feed(self, token):
+        '''Read the next token (a LexToken); return False if it can't
+        continue the input read so far. The token is then dropped, and
+        the tokens fed later are ignored.'''
+        if self.finished:
+            raise ValueError("the parse is finished")
+        if not self.viable:
+            return False
+        index = len(self.types)
+        self.tokens.append(token)
+        self.types.append(self.token_ids.get(token.type, NO_SYMBOL))
+        self.chart.append(EarleySet())
+        self._close_set(index)
+        if not self.chart[index + 1].items:
+            self.viable = False
+            del self.tokens[-1], self.types[-1], self.chart[-1]
+        return self.viable
+
+
+    def is_viable(self):
+        '''Return True if the tokens fed so far start a valid input.'''
+        return self.viable
+
+
+    def expected_tokens(self):
+        '''Return the names of the tokens that can be fed next (those the
+        rejected token was expected to be, if feed failed), with END if the
+        input can end here.'''
+        index = len(self.types)
+        if index == 0:
+            expected = self.parser.first_of([self.start_id], [END_ID])
+        else:
+            # the items of the set, then the items waiting for the items that can complete
+            expected, seen = set(), set()
+            stack = [(item, item.dot) for item in self.chart[index].items]
+            while stack:
+                item, dot = stack.pop()
+                if (item, dot) in seen:
+                    continue
+                seen.add((item, dot))
+                if self.parser._add_first(expected, self.bodies[item.production][dot:]):
+                    head = self.productions[item.production].head_id
+                    if head == self.start_id and item.start == 0:
+                        expected.add(END_ID)
+                    stack.extend((waiting, waiting.dot + 1)
+                                 for waiting in self.chart[item.start].waiting.get(head, ()))
+        return set(END if symbol == END_ID else self.parser.symbol_names[symbol]
+                   for symbol in expected)
+
+
+    def finish(self):
+        '''End the input; return the value of the start symbol, None if
+        the input can't be parsed.'''
+        for item in self._goal_items():
+            for value in self._derivations(item):
+                return value
+
+
+    def _goal_items(self):
+        if not self.viable:
+            return []
+        index = len(self.types)
+        if not self.finished:
+            self.finished = True
+            self._close_set(index)
+        return [item for item in self.chart[index].items
+                if self._is_goal_item(item)]
+
+
+    def _close_set(self, index):
+        '''Process the set at index, once its next token (if any) is known.'''
+        if index == 0:
+            self._predict_closure(self.start_id, 0)
+        self._process_set(index)
+
+
+    def _process_set(self, index):
+        earley_set, bodies = self.chart[index], self.bodies
+        items = earley_set.items
+        i = 0
+        while i < len(items):  # items grows while it's processed
+            item = items[i]
+            i += 1
+            body = bodies[item.production]
+            if item.dot < len(body):
+                symbol = body[item.dot]
+                if self.alternatives[symbol]:
+                    self.predict(item, symbol, index)
+                else:
+                    self.scan(item, symbol, index)
+            else:
+                self.complete(item, index)
+
+
+    def predict(self, item, symbol, index):
+        earley_set = self.chart[index]
+        if not earley_set.predicted >> symbol & 1:
+            self._predict_closure(symbol, index)
+        if symbol in self.nullable:
+            earley_set.add(item.advance(earley_set.empty_link(symbol)), self.bodies)
+
+
+    def _predict_closure(self, symbol, index):
+        earley_set = self.chart[index]
+        token = self.types[index] if index < len(self.types) else END_ID
+        prediction = self.predictions.get((symbol, token))
+        if prediction is None:
+            mask, productions = self.closures[symbol]
+            productions = [n for n in productions
+                           if token in self.starts[n][0] or self.starts[n][1]]
+            prediction = self.predictions[symbol, token] = mask, productions
+        mask, productions = prediction
+        new = mask & ~earley_set.predicted
+        earley_set.predicted |= mask
+        for n in productions:
+            if new >> self.productions[n].head_id & 1:
+                earley_set.add(EarleyItem(n, 0, index, None, None), self.bodies)
+
+
+    def scan(self, item, symbol, index):
+        if index < len(self.types) and self.types[index] == symbol:
+            value = self.tokenfunc(self.tokens[index])
+            self.chart[index + 1].add(item.advance(value), self.bodies)
+
+
+    def complete(self, item, index):
+        earley_set, head = self.chart[index], self.productions[item.production].head_id
+        if item.start == index:  # the items waiting for head were advanced by predict
+            earley_set.empty_link(head).items.append(item)
+            return
+        if self.leo:
+            entry = self._leo_entry(item.start, head)
+            if entry is not None:
+                top = entry.top
+                earley_set.add(EarleyItem(top.production, top.dot + 1, top.start,
+                                          top, LeoLink(entry, item)), self.bodies)
+                return
+        for waiting in self.chart[item.start].waiting.get(head, ()):
+            earley_set.add(waiting.advance(item), self.bodies)
+
+
+    def _leo_entry(self, index, symbol):
+        '''Return the LeoEntry of symbol in the (processed) set at index, None
+        if the completion of symbol there is not deterministic.'''
+        path, seen = [], set()
+        while True:
+            earley_set = self.chart[index]
+            if symbol in earley_set.leo:
+                entry = earley_set.leo[symbol]
+                break
+            waiting = earley_set.waiting.get(symbol, ())
+            penultimate = waiting[0] if len(waiting) == 1 else None
+            if (penultimate is None or (index, symbol) in seen or
+                penultimate.dot + 1 <> len(self.bodies[penultimate.production])):
+                entry = earley_set.leo[symbol] = None
+                break
+            head = self.productions[penultimate.production].head_id
+            if head == self.start_id and penultimate.start == 0:  # keep the goal items
+                entry = earley_set.leo[symbol] = None
+                break
+            seen.add((index, symbol))
+            path.append((earley_set, symbol, penultimate))
+            index, symbol = penultimate.start, head
+        for earley_set, symbol, penultimate in reversed(path):
+            entry = earley_set.leo[symbol] = LeoEntry(penultimate, entry)
+        return entry
+
 
-    def _update_chart(self, index, token):
+    def _derivations(self, item):
+        '''Yield the values of the (acyclic) derivations of a complete item.'''
+        choices = []
         while True:
-            changed = False
-            for state in self.chart[index]:
-                next_states = self.predict(state, index)
-                for s in next_states:
-                    changed |= self.add_to_chart(s, index)
-
-                next_state = self.scanning(state, token)
-                if next_state is not None:
-                    changed |= self.add_to_chart(next_state, index+1)
-
-                next_states = self.complete(state)
-                for s in next_states:
-                    changed |= self.add_to_chart(s, index)
-            if not changed:
+            sizes = []
+            value = self._walk(item, choices, sizes)
+            if value is not CYCLE:
+                yield value
+            while choices and choices[-1] + 1 == sizes[len(choices) - 1]:
+                choices.pop()
+            if not choices:
                 break
+            choices[-1] += 1
 
 
-    def _is_goal_state(self, state):
-        return (state.head == self.start_symbol and
-                state.after == () and
-                state.start == 0)
+    def _walk(self, item, choices, sizes):
+        '''Call the p_ functions of a derivation of a complete item
+        bottom-up (without recursion) and return its value, CYCLE if the
+        derivation is cyclic. choices[k] selects the derivation of the k-th
+        ambiguous item met (0 if choices is shorter; it's extended), and
+        sizes[k] is set to the number of its derivations.'''
+        frames, path = [], set()
+        node = item
+        while True:
+            if isinstance(node, LeoLink):
+                node = node.expand()
+            elif isinstance(node, EmptyLink):
+                node = node.items[self._choose(len(node.items), choices, sizes)]
+            if node in path:
+                return CYCLE
+            path.add(node)
+            frames.append((node, self._children(node, choices, sizes), [None]))
+            while True:
+                node, children, p = frames[-1]
+                if len(p) <= len(children):
+                    child = children[len(p) - 1]
+                    if _is_deferred(child):
+                        node = child
+                        break
+                    p.append(child)
+                    continue
+                frames.pop()
+                path.discard(node)
+                self.productions[node.production].yield_rule(p)
+                if not frames:
+                    return p[0]
+                frames[-1][2].append(p[0])
+
+
+    def _children(self, item, choices, sizes):
+        '''Return the values of the symbols before the dot of item (raw
+        token values or deferred values, see _is_deferred).'''
+        values = []
+        while item.dot > 0:
+            if item.packed is None:
+                left, value = item.left, item.value
+            else:
+                left, value = item.derivation(self._choose(len(item.packed) + 1, choices, sizes))
+            values.append(value)
+            item = left
+        values.reverse()
+        return values
 
 
-    def _get_token_type(self, token):
-        return token.type
+    def _choose(self, n, choices, sizes):
+        '''Return the option (of n > 0) taken at the next choice point.'''
+        if n == 1:
+            return 0
+        k = len(sizes)
+        if k == len(choices):
+            choices.append(0)
+        sizes.append(n)
+        return choices[k]
 
 
-    def _is_epsilon(self, char):
-        return char == EPSILON
+    def _is_goal_item(self, item):
+        return (self.productions[item.production].head_id == self.start_id and
+                item.dot == len(self.bodies[item.production]) and
+                item.start == 0)
 
 
-    def _skip_epsilon(self, state):
-        while state.after <> () and self._is_epsilon(state.after[0]):
-            eps = state.after[0]
-            state.before = state.before + (eps,)
-            state.after = state.after[1:]
 
 
-    def _dummy_token(self):
-        token = LexToken()
-        token.type = None
-        return token
-        
+class EarleySet(object):
+    '''The items of an Earley set: in the order of addition, deduplicated
+       by (production, dot, start) (see EarleyItem.pack), and indexed by
+       the next symbol.'''
 
+    __slots__ = ("items", "keys", "waiting", "empty", "leo", "predicted")
 
+    def __init__(self):
+        self.items = []
+        self.keys = {}       # (production, dot, start) => item
+        self.waiting = {}    # symbol id => items expecting the symbol
+        self.empty = {}      # symbol id => EmptyLink of the symbol
+        self.leo = {}        # symbol id => LeoEntry (None: no entry)
+        self.predicted = 0   # bitset of the symbol ids predicted here
 
-class ChartState(object):
-    def __init__(self,
-                 head=None,
-                 before=None,
-                 after=None,
-                 start=0,
-                 tree=None,
-                 yield_rule=None):
-        self.head = head
-        self.before = () if (before is None) else before
-        self.after = () if (after is None) else after
+
+    def add(self, item, bodies):
+        '''Add an item, or pack its derivation into the equal item.'''
+        key = item.production, item.dot, item.start
+        if key in self.keys:
+            self.keys[key].pack(item.left, item.value)
+            return False
+        self.keys[key] = item
+        self.items.append(item)
+        body = bodies[item.production]
+        if item.dot < len(body):
+            self.waiting.setdefault(body[item.dot], []).append(item)
+        return True
+
+
+    def empty_link(self, symbol):
+        link = self.empty.get(symbol)
+        if link is None:
+            link = self.empty[symbol] = EmptyLink()
+        return link
+
+
+
+
+class LeoEntry(object):
+    '''Leo's transitive item of a symbol in an Earley set: penultimate is
+       the only item waiting for the symbol there (the symbol is its last
+       one); parent is the entry of the head of penultimate in its start
+       set, if its completion is deterministic as well. top is the
+       penultimate item of the topmost entry of the chain.'''
+
+    __slots__ = ("penultimate", "parent", "top")
+
+    def __init__(self, penultimate, parent):
+        self.penultimate, self.parent = penultimate, parent
+        self.top = parent.top if parent is not None else penultimate
+
+
+
+
+class LeoLink(object):
+    '''The value of the last symbol of entry.top: item (complete) goes up
+       the chain of entry. The complete items of the chain are created only
+       if the value is needed (see EarleyParser._walk).'''
+
+    __slots__ = ("entry", "item", "_expanded")
+
+    def __init__(self, entry, item):
+        self.entry, self.item, self._expanded = entry, item, None
+
+
+    def expand(self):
+        if self._expanded is None:
+            node, entry = self.item, self.entry
+            while entry.parent is not None:
+                penultimate = entry.penultimate
+                node = penultimate.advance(node)
+                entry = entry.parent
+            self._expanded = node
+        return self._expanded
+
+
+
+
+class EmptyLink(object):
+    '''The value of a nullable symbol deriving the empty string in an
+       Earley set: items are the complete items of the symbol starting and
+       ending there (one for each derivation).'''
+
+    __slots__ = ("items",)
+
+    def __init__(self):
+        self.items = []
+
+
+
+
+def _is_deferred(value):
+    '''Return True if the value of a symbol of an Earley item refers to the
+    item (or a link) deriving the value.'''
+    return isinstance(value, (EarleyItem, LeoLink, EmptyLink))
+
+
+CYCLE = object()  # result of EarleyParser._walk for a cyclic derivation
+
+
+
+
+class EarleyItem(object):
+    '''Production (index) with a dot, started at token index 'start'. A
+       node of the parse forest: unless dot is 0, it was derived by
+       advancing the item left over a symbol of the given value (the
+       complete item or the LeoLink of a nonterminal, see _is_deferred).
+       packed holds the other (left, value) derivations of the item.'''
+
+    __slots__ = ("production", "dot", "start", "left", "value", "packed")
+
+    def __init__(self, production, dot, start, left, value):
+        self.production = production
+        self.dot = dot
         self.start = start
-        self.tree = [None] if (tree is None) else tree  # AST is initially None
-        self.yield_rule = yield_rule
+        self.left = left
+        self.value = value
+        self.packed = None
 
-        self.skip_epsilon()
 
+    def advance(self, value):
+        return EarleyItem(self.production, self.dot + 1, self.start, self, value)
 
-    def skip_epsilon(self):
-        while self.after <> () and is_epsilon_transition(self.after[0]):
-            eps = self.after[0]
-            self.before = self.before + (eps,)
-            self.after = self.after[1:]
 
+    def pack(self, left, value):
+        if self.left is left and self.value is value:
+            return
+        if self.packed is None:
+            self.packed = []
+        elif any(l is left and v is value for l, v in self.packed):
+            return
+        self.packed.append((left, value))
 
-    def __eq__(self, other):
-        return (self.head == other.head and
-                self.before == other.before and
-                self.after == other.after and
-                self.start == other.start)
 
+    def derivation(self, n):
+        return (self.left, self.value) if n == 0 else self.packed[n - 1]
 
-    def __ne__(self, other):
-        return not self.__eq__(other)
 
-    
+
+
+class LALRParser(Grammar):
+    '''Table-driven LALR(1) parser. The tables are built by propagating
+       lookaheads over the LR(0) automaton (the dragon book, 4.7.5).
+       Conflicts are reported when the tables are built and resolved like
+       yacc does: a shift wins over a reduce, and of two reduces the
+       production defined first wins.
+
+       action[state][token id] is the next state (a shift) or ~n (reduce
+       by productions[n]; ~0 accepts); goto[state][nonterminal id] is the
+       state after a reduce. If cachefile is given, the tables are saved
+       to it and loaded from it while the grammar is the same.'''
+
+    PROPAGATED = -4  # a dummy lookahead that marks propagation
+
+    def __init__(self, module=None, cachefile=None):
+        Grammar.__init__(self, module)
+        augmented = Production(head=None, body=(self.start_symbol,))
+        augmented.body_ids = (self.start_id,)
+        self.productions = [augmented] + [production for productions in self.alternatives
+                                          for production in productions]
+        self.bodies = [tuple(symbol for symbol in production.body_ids
+                             if not is_epsilon_transition(symbol))
+                       for production in self.productions]
+        self.indices = [[] for _ in self.symbol_names]  # symbol id => indices of its productions
+        for n, production in enumerate(self.productions[1:], 1):
+            self.indices[production.head_id].append(n)
+
+        tables = load_cache(cachefile, self.signature()) if cachefile is not None else None
+        if tables is None:
+            self.conflicts = []
+            kernels, transitions = self._lr0_automaton()
+            lookaheads = self._lookaheads(kernels, transitions)
+            self.action, self.goto = self._build_tables(kernels, transitions, lookaheads)
+            if cachefile is not None:
+                save_cache(cachefile, self.signature(), self.tables())
+        else:
+            self.action, self.goto, self.conflicts = tables
+
+
+    def tables(self):
+        return self.action, self.goto, self.conflicts
+
+
+    def _closure(self, items):
+        '''LR(1) closure of items (production index, dot, lookahead id).'''
+        res, stack = set(items), list(items)
+        while stack:
+            n, dot, lookahead = stack.pop()
+            body = self.bodies[n]
+            if dot < len(body) and self.indices[body[dot]]:
+                for first in self.first_of(body[dot + 1:], (lookahead,)):
+                    for m in self.indices[body[dot]]:
+                        item = (m, 0, first)
+                        if item not in res:
+                            res.add(item)
+                            stack.append(item)
+        return res
+
+
+    def _lr0_closure(self, kernel):
+        res, stack = set(kernel), list(kernel)
+        while stack:
+            n, dot = stack.pop()
+            body = self.bodies[n]
+            if dot < len(body):
+                for m in self.indices[body[dot]]:
+                    if (m, 0) not in res:
+                        res.add((m, 0))
+                        stack.append((m, 0))
+        return res
+
+
+    def _lr0_automaton(self):
+        '''Return the kernels (sets of items (production index, dot)) of
+        the LR(0) states and the transitions (state => {symbol id: state}).'''
+        kernels, transitions = [frozenset([(0, 0)])], []
+        index = {kernels[0]: 0}
+        for kernel in kernels:  # kernels grows while iterating
+            moves = defaultdict(set)
+            for n, dot in self._lr0_closure(kernel):
+                if dot < len(self.bodies[n]):
+                    moves[self.bodies[n][dot]].add((n, dot + 1))
+            row = {}
+            for symbol, items in moves.items():
+                items = frozenset(items)
+                if items not in index:
+                    index[items] = len(kernels)
+                    kernels.append(items)
+                row[symbol] = index[items]
+            transitions.append(row)
+        return kernels, transitions
+
+
+    def _lookaheads(self, kernels, transitions):
+        '''Return state => {kernel item: set of lookahead ids}.'''
+        lookaheads = [dict((item, set()) for item in kernel) for kernel in kernels]
+        lookaheads[0][(0, 0)].add(END_ID)
+        propagation = []  # ((state, item), (state, item))
+        for state, kernel in enumerate(kernels):
+            for item in kernel:
+                for n, dot, lookahead in self._closure([item + (self.PROPAGATED,)]):
+                    if dot == len(self.bodies[n]):
+                        continue
+                    target = transitions[state][self.bodies[n][dot]], (n, dot + 1)
+                    if lookahead == self.PROPAGATED:
+                        propagation.append(((state, item), target))
+                    else:
+                        lookaheads[target[0]][target[1]].add(lookahead)
+        changed = True
+        while changed:
+            changed = False
+            for (state, item), (target, target_item) in propagation:
+                source, dest = lookaheads[state][item], lookaheads[target][target_item]
+                if not source <= dest:
+                    dest |= source
+                    changed = True
+        return lookaheads
+
+
+    def _build_tables(self, kernels, transitions, lookaheads):
+        action, goto = [], []
+        for state, kernel in enumerate(kernels):
+            row = {}
+            reductions = defaultdict(list)  # lookahead => production indices
+            items = [item + (lookahead,) for item in kernel for lookahead in lookaheads[state][item]]
+            for n, dot, lookahead in self._closure(items):
+                if dot == len(self.bodies[n]) and n not in reductions[lookahead]:
+                    reductions[lookahead].append(n)
+            for lookahead, indices in sorted(reductions.items()):
+                indices.sort()
+                for n in indices[1:]:
+                    self._conflict(state, "reduce/reduce", lookahead,
+                                   "reduce by %s, not by %s" % (self.productions[indices[0]],
+                                                                self.productions[n]))
+                row[lookahead] = ~indices[0]
+            gotos = {}
+            for symbol, target in transitions[state].items():
+                if self.alternatives[symbol]:
+                    gotos[symbol] = target
+                    continue
+                if symbol in row:
+                    self._conflict(state, "shift/reduce", symbol,
+                                   "shift, not reduce by %s" % self.productions[~row[symbol]])
+                row[symbol] = target
+            action.append(row)
+            goto.append(gotos)
+        return action, goto
+
+
+    def _conflict(self, state, kind, symbol, resolution):
+        name = "$end" if symbol == END_ID else self.symbol_names[symbol]
+        message = "%s conflict in state %d on %r: %s" % (kind, state, name, resolution)
+        self.conflicts.append(message)
+        print "WARNING: %s" % message
+
+
+    def parse(self, text, lexer, tokenfunc=None, skip_lexerrors=False):
+        '''Return the value of the start symbol; a ParseError of the token
+        that has no action if the text can't be parsed.'''
+        tokenfunc = tokenfunc or (lambda token: token.value)
+        lexer.input(text)
+        tokens = lexer.tokenize()  # TokenBuffer
+        if tokens.errors != [] and not skip_lexerrors:
+            raise ValueError(str(tokens.errors[0]))
+        types = self.token_types(tokens)
+
+        action, goto, productions, bodies = self.action, self.goto, self.productions, self.bodies
+        states, values, i = [0], [], 0
+        while True:
+            symbol = types[i] if i < len(types) else END_ID
+            act = action[states[-1]].get(symbol)
+            if act is None:
+                return self.error_at(tokens, i)
+            elif act >= 0:  # shift
+                states.append(act)
+                values.append(tokenfunc(tokens[i]))
+                i += 1
+            elif act == ~0:  # accept
+                return values[-1]
+            else:
+                n = len(bodies[~act])
+                p = [None] + values[len(values) - n:]
+                del values[len(values) - n:], states[len(states) - n:]
+                production = productions[~act]
+                production.yield_rule(p)
+                values.append(p[0])
+                states.append(goto[states[-1]][production.head_id])
+
+
+
+
+class LL1Parser(Grammar):
+    '''Table-driven LL(1) (predictive) parser with an explicit stack.
+       table[nonterminal id][token id] is the index of the production to
+       expand (the token is the next one of the input, END_ID at the end).
+       A grammar that is left-recursive or has a conflict (two productions
+       of a nonterminal predicted by the same token) is not LL(1): a
+       SyntaxError is raised. If cachefile is given, the table is saved to
+       it and loaded from it while the grammar is the same.'''
+
+    def __init__(self, module=None, cachefile=None):
+        Grammar.__init__(self, module)
+        self.productions = [production for productions in self.alternatives
+                            for production in productions]
+        self.bodies = [tuple(symbol for symbol in production.body_ids
+                             if not is_epsilon_transition(symbol))
+                       for production in self.productions]
+
+        tables = load_cache(cachefile, self.signature()) if cachefile is not None else None
+        if tables is None:
+            self._check_left_recursion()
+            self.table = self._build_table()
+            if cachefile is not None:
+                save_cache(cachefile, self.signature(), self.tables())
+        else:
+            self.table = tables
+
+
+    def tables(self):
+        return self.table
+
+
+    def _check_left_recursion(self):
+        '''Raise SyntaxError if a nonterminal can derive a sentential form
+        that starts with itself (the parser would expand it forever).'''
+        left_calls = [set() for _ in self.symbol_names]
+        for n, production in enumerate(self.productions):
+            for symbol in self.bodies[n]:
+                if self.alternatives[symbol]:
+                    left_calls[production.head_id].add(symbol)
+                if symbol not in self.nullable:
+                    break
+        for symbol, calls in enumerate(left_calls):
+            if symbol in _reachable(left_calls, calls, ()):
+                raise SyntaxError("not an LL(1) grammar: %s is left-recursive"
+                                  % self.symbol_names[symbol])
+
+
+    def _build_table(self):
+        table = [{} for _ in self.symbol_names]
+        for n, production in enumerate(self.productions):
+            head = production.head_id
+            lookaheads = self.first_of(self.bodies[n], self.follow[head])
+            for symbol in sorted(lookaheads):
+                if symbol in table[head]:
+                    self._conflict(head, symbol, self.productions[table[head][symbol]], production)
+                table[head][symbol] = n
+        return table
+
+
+    def _conflict(self, head, symbol, chosen, production):
+        name = END if symbol == END_ID else self.symbol_names[symbol]
+        raise SyntaxError("not an LL(1) grammar: conflict of %s on %r between %s and %s"
+                          % (self.symbol_names[head], name, chosen, production))
+
+
+    def parse(self, text, lexer, tokenfunc=None, skip_lexerrors=False):
+        '''Return the value of the start symbol; a ParseError of the token
+        that doesn't match the prediction if the text can't be parsed.'''
+        tokenfunc = tokenfunc or (lambda token: token.value)
+        lexer.input(text)
+        tokens = lexer.tokenize()  # TokenBuffer
+        if tokens.errors != [] and not skip_lexerrors:
+            raise ValueError(str(tokens.errors[0]))
+        types = self.token_types(tokens)
+
+        table, productions, bodies = self.table, self.productions, self.bodies
+        # symbol ids to derive and ~n for the reduce by productions[n]
+        stack, values, i = [self.start_id], [], 0
+        symbol = types[0] if types else END_ID
+        while stack:
+            top = stack.pop()
+            if top < 0:
+                n = len(bodies[~top])
+                p = [None] + values[len(values) - n:]
+                del values[len(values) - n:]
+                productions[~top].yield_rule(p)
+                values.append(p[0])
+            elif self.alternatives[top]:
+                n = table[top].get(symbol)
+                if n is None:
+                    return self.error_at(tokens, i)
+                stack.append(~n)
+                stack.extend(reversed(bodies[n]))
+            elif top == symbol:
+                values.append(tokenfunc(tokens[i]))
+                i += 1
+                symbol = types[i] if i < len(types) else END_ID
+            else:
+                return self.error_at(tokens, i)
+        return values[0] if symbol == END_ID else self.error_at(tokens, i)
+
 
 
 
@@ -331,6 +1509,11 @@ class Production(object):
         self.head = head
         self.body = body
         self.yield_rule = yield_rule
+        self.head_id, self.body_ids = None, ()  # set by YaccInfo
+
+
+    def __str__(self):
+        return "%s : %s" % (self.head, " ".join(atom for atom in self.body if atom <> EPSILON))
 
 
 
@@ -342,6 +1525,25 @@ class YaccInfo(object):
         self.tokens, p_rules = self._get_yacc_variables(module)
         p_rules = map(self._convert_rule, p_rules)
         self.production_rules = self._create_production_rules(p_rules)
+        self._intern_symbols()
+
+
+    def _intern_symbols(self):
+        '''Assign small integer ids to the grammar symbols: tokens first (in
+        the order of 'tokens', so the ids match the lexer's type ids), then
+        nonterminals and undefined symbols in the order of appearance.'''
+        self.symbol_names = list(self.tokens)
+        self.symbol_ids = {name: i for i, name in enumerate(self.symbol_names)}
+        heads = [rule.head for rule in self.production_rules]
+        bodies = [atom for rule in self.production_rules for atom in rule.body]
+        for name in heads + bodies:
+            if name not in self.symbol_ids and name != EPSILON:
+                self.symbol_ids[name] = len(self.symbol_names)
+                self.symbol_names.append(name)
+        for rule in self.production_rules:
+            rule.head_id = self.symbol_ids[rule.head]
+            rule.body_ids = tuple(EPSILON_ID if atom == EPSILON else self.symbol_ids[atom]
+                                  for atom in rule.body)
 
 
     def _get_yacc_variables(self, module):